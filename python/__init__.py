@@ -9,10 +9,12 @@ from ._parameter import Parameter
 from ._parser_function import ParserFunction
 from ._section import Section
 from ._table import Table
+from ._table_export import TableRecord, export_tables, iter_table_records
 from ._tag import Tag
 from ._template import Template
 from ._wikilink import WikiLink
 from ._wikilist import LIST_PATTERN_FORMAT as _LIST_PATTERN_FORMAT, WikiList
+from ._wikitext_utils import OffsetMap  # noqa: F401
 
 _wikitext.ExternalLink = ExternalLink
 _wikitext.WikiLink = WikiLink
@@ -27,7 +29,17 @@ _wikitext.Section = Section
 _wikitext.WikiList = WikiList
 _wikitext.LIST_PATTERN_FORMAT = _LIST_PATTERN_FORMAT
 _wikitext.Tag = _wikitext.ExtensionTag = Tag
+# The node class of each of the SPAN_PARSER_TYPES, e.g. for `parent()`.
+_wikitext.SPAN_PARSER_CLASSES = {
+    'Template': Template,
+    'ParserFunction': ParserFunction,
+    'WikiLink': WikiLink,
+    'Comment': Comment,
+    'Parameter': Parameter,
+    'ExtensionTag': Tag,
+}
 
 WikiText = _wikitext.WikiText
 parse = WikiText
 remove_markup = _wikitext.remove_markup
+iter_remove_markup = _wikitext.iter_remove_markup
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import MutableSequence
+from typing import Iterable, Iterator, MutableSequence
 
 from regex import DOTALL, MULTILINE, Match
 
@@ -24,7 +24,7 @@ class Argument(SubWikiText):
     See https://www.mediawiki.org/wiki/Help:Templates for more information.
     """
 
-    __slots__ = '_shadow_match_cache', '_parent'
+    __slots__ = '_shadow_match_cache', '_parent', '_position_cache'
 
     def __init__(
         self,
@@ -37,6 +37,8 @@ class Argument(SubWikiText):
         super().__init__(string, _type_to_spans, _span, _type)
         self._parent = _parent or self
         self._shadow_match_cache = None, None
+        # (document version, position), set by the parent's `arguments`
+        self._position_cache: tuple[int, int] | None = None
 
     @property
     def _shadow_match(self) -> Match[bytes]:
@@ -64,17 +66,23 @@ class Argument(SubWikiText):
             s, e = shadow_match.span('pre_eq')
             return self._lststr[0][ss + s : ss + e]
         # positional argument
-        position = 1
-        parent_find = self._parent._shadow.find
-        parent_start = self._parent._span_data[0]
-        for s, e, _, _ in self._type_to_spans[self._type]:
-            if ss <= s:
-                break
-            if parent_find(b'=', s - parent_start, e - parent_start) != -1:
-                # This is a keyword argument.
-                continue
-            # This is a preceding positional argument.
-            position += 1
+        version = self._lststr.version
+        position_cache = self._position_cache
+        if position_cache is None or position_cache[0] != version:
+            parent = self._parent
+            if parent is not self:
+                parent.arguments  # renumbers the arguments
+                position_cache = self._position_cache
+        if position_cache is not None and position_cache[0] == version:
+            return str(position_cache[1])
+        # self is not one of the current arguments of its parent
+        parent = self._parent
+        (position,) = _positions(
+            self._type_to_spans[self._type],
+            (ss,),
+            parent._shadow,
+            parent._span_data[0],
+        )
         return str(position)
 
     @name.setter
@@ -151,3 +159,28 @@ class Argument(SubWikiText):
                 - len(ls_post_eq),
             )
         return bytearray(shadow_match[0][1:]), self._span_data[0] + 1
+
+
+def _positions(
+    spans: list[list],
+    starts: Iterable[int],
+    parent_shadow: bytearray,
+    parent_start: int,
+) -> Iterator[int]:
+    """Yield the position of the positional argument at each of starts.
+
+    The position is one plus the number of the preceding argument spans of
+    the parent that have no equal sign, i.e. are positional. `spans` are
+    the sorted argument spans of the parent and `starts` must be sorted.
+    """
+    find = parent_shadow.find
+    spans_len = len(spans)
+    i = 0
+    position = 1
+    for start in starts:
+        while i < spans_len and spans[i][0] < start:
+            s, e, _, _ = spans[i]
+            if find(b'=', s - parent_start, e - parent_start) == -1:
+                position += 1
+            i += 1
+        yield position
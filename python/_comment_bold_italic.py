@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import MutableSequence
+from typing import Iterator, MutableSequence
 
 from regex import DOTALL, MULTILINE, Match
 
@@ -35,6 +35,9 @@ class Comment(SubWikiText):
     def comments(self) -> list[Comment]:
         return []
 
+    def iter_comments(self) -> Iterator[Comment]:
+        return iter(())
+
 
 class BoldItalic(SubWikiText):
     __slots__ = ()
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+from itertools import islice
+from typing import Iterator
+
 from ._wikitext import WS, SubWikiText
 
 
@@ -103,6 +106,9 @@ class Parameter(SubWikiText):
     def parameters(self) -> list[Parameter]:
         return super().parameters[1:]
 
+    def iter_parameters(self) -> Iterator[Parameter]:
+        return islice(super().iter_parameters(), 1, None)
+
     @property
     def _content_span(self) -> tuple[int, int]:
         return 3, -3
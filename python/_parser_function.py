@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 from bisect import insort
-from typing import Iterable
+from itertools import islice
+from typing import Iterable, Iterator, MutableSequence
 
-from ._argument import Argument
+from ._argument import Argument, _positions
+from ._spans import TypeToSpans
 from ._wikilist import WikiList
-from ._wikitext import SubWikiText, rc
+from ._wikitext import WS, SubWikiText, rc
 
 PF_NAME_ARGS_FULLMATCH = rc(
     rb'[^:|}]*+(?#name)' rb'(?<arg>:[^|]*+)?+(?<arg>\|[^|]*+)*+'
@@ -15,11 +17,47 @@ PF_NAME_ARGS_FULLMATCH = rc(
 class SubWikiTextWithArgs(SubWikiText):
     """Define common attributes for `Template` and `ParserFunction`."""
 
-    __slots__ = ()
+    __slots__ = ('_arg_index_cache',)
 
     _name_args_matcher = NotImplemented
     _first_arg_sep = 0
 
+    def __init__(
+        self,
+        string: str | MutableSequence[str],
+        _type_to_spans: TypeToSpans | None = None,
+        _span: list | None = None,
+        _type: str | int | None = None,
+    ) -> None:
+        super().__init__(string, _type_to_spans, _span, _type)
+        self._arg_index_cache: tuple | None = None
+
+    def _arg_index(
+        self,
+    ) -> tuple[list[tuple[str, Argument]], dict[str, list[Argument]]]:
+        """Return the arguments by their stripped names.
+
+        The first item is a list of (name, argument) pairs in the order of
+        the arguments. The second one maps each name to the arguments that
+        have it, in the same order. Both are computed once per version of the
+        document and must not be modified.
+        """
+        version = self._lststr.version
+        cache = self._arg_index_cache
+        if cache is not None and cache[0] == version:
+            return cache[1], cache[2]
+        named_args = []
+        index: dict[str, list[Argument]] = {}
+        for arg in self.arguments:
+            name = arg.name.strip(WS)
+            named_args.append((name, arg))
+            try:
+                index[name].append(arg)
+            except KeyError:
+                index[name] = [arg]
+        self._arg_index_cache = version, named_args, index
+        return named_args, index
+
     @property
     def _content_span(self) -> tuple[int, int]:
         return 2, -2
@@ -45,7 +83,6 @@ class SubWikiTextWithArgs(SubWikiText):
         type_to_spans = self._type_to_spans
         ss, se, _, _ = span = self._span_data
         type_ = id(span)
-        lststr = self._lststr
         arg_spans = type_to_spans.setdefault(type_, [])
         span_tuple_to_span_get = {(s[0], s[1]): s for s in arg_spans}.get
         for arg_self_start, arg_self_end in split_spans:
@@ -61,9 +98,18 @@ class SubWikiTextWithArgs(SubWikiText):
                 insort(arg_spans, arg_span)
             else:
                 arg_span = old_span
-            arg = Argument(lststr, type_to_spans, arg_span, type_, self)
+            arg = self._node(Argument, arg_span, type_, self)
             arg._span_data[3] = shadow[arg_self_start:arg_self_end]
             arguments_append(arg)
+        # Number the positional arguments for `Argument.name` in one pass.
+        version = self._lststr.version
+        for arg, position in zip(
+            arguments,
+            _positions(
+                arg_spans, [a._span_data[0] for a in arguments], shadow, ss
+            ),
+        ):
+            arg._position_cache = version, position
         return arguments
 
     def get_lists(
@@ -107,3 +153,6 @@ class ParserFunction(SubWikiTextWithArgs):
     @property
     def parser_functions(self) -> list[ParserFunction]:
         return super().parser_functions[1:]
+
+    def iter_parser_functions(self) -> Iterator[ParserFunction]:
+        return islice(super().iter_parser_functions(), 1, None)
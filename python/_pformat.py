@@ -0,0 +1,529 @@
+"""Render `WikiText.pformat` in one pass over the node tree.
+
+The result is that of the original algorithm: remove the comments, format
+the templates, and then the parser functions of a copy in place, innermost
+first. Instead of editing a copy, each node is rendered once from the
+original string and the pieces are joined. Where an edit of the copy would
+have affected the later steps, e.g. by resetting a cached shadow, the same
+effect is reproduced explicitly; see the `_Formatter` methods.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from itertools import islice
+from math import inf
+
+from wcwidth import wcswidth
+
+from ._wikitext_utils import WS
+
+COMMENT, TEMPLATE, PARSER_FUNCTION = range(3)
+
+
+class _Node:
+    """A removed comment, a template, or a parser function of the view."""
+
+    __slots__ = (
+        'start',
+        'end',
+        'kind',
+        'obj',
+        'kids',
+        'kid_starts',
+        'has_pf',
+        'edited',
+        'draft',
+        'text',
+        'detached',
+    )
+
+    def __init__(self, obj, kind: int) -> None:
+        if obj is None:  # the root
+            self.start = self.end = inf
+        else:
+            self.start, self.end, _, _ = obj._span_data
+        self.kind = kind
+        self.obj = obj
+        # the direct child nodes and their starts, for bisecting
+        self.kids: list[_Node] = []
+        self.kid_starts: list[int] = []
+        # True if there is a parser function in the subtree of self
+        self.has_pf = kind == PARSER_FUNCTION
+        # True if formatting self edits it, see `_Formatter._any_edited`
+        self.edited = False
+        # the text of a template before and after formatting the parser
+        # functions inside it, or the text of a parser function
+        self.draft: str | None = None
+        self.text: str | None = None
+        # a copy of obj with a fresh shadow, see `_Formatter._obj`
+        self.detached = None
+
+
+def _node_tree(view, remove_comments: bool) -> tuple[_Node, int]:
+    """Return the root of the node tree and the start of the first comment.
+
+    Only the comments that are going to be removed are part of the tree.
+    Nodes that cross the end of the view, e.g. a template in which the view
+    of an Italic ends, are left out and kept as is.
+    """
+    ws = WS
+    ve = view._span_data[1]
+    nodes = [
+        _Node(c, COMMENT)
+        for c in view.comments
+        if c._span_data[1] <= ve
+        and (remove_comments or not c.contents.strip(ws))
+    ]
+    first_removed = nodes[0].start if nodes else inf
+    nodes += [
+        _Node(t, TEMPLATE) for t in view.templates if t._span_data[1] <= ve
+    ]
+    nodes += [
+        _Node(f, PARSER_FUNCTION)
+        for f in view.parser_functions
+        if f._span_data[1] <= ve
+    ]
+    nodes.sort(key=lambda n: (n.start, -n.end))
+    root = _Node(None, -1)
+    stack = [root]
+    for node in nodes:
+        s = node.start
+        while stack[-1].end <= s:
+            stack.pop()
+        parent = stack[-1]
+        parent.kids.append(node)
+        parent.kid_starts.append(s)
+        if node.has_pf:
+            for ancestor in reversed(stack):
+                if ancestor.has_pf:
+                    break
+                ancestor.has_pf = True
+        stack.append(node)
+    return root, first_removed
+
+
+def _join_args(seps: list, names: list, values: list) -> str:
+    return ''.join(
+        [
+            sep + value if name is None else sep + name + '=' + value
+            for sep, name, value in zip(seps, names, values)
+        ]
+    )
+
+
+def _renamed(arg, sep: str, name: str, value: str) -> str | None:
+    """Return the name that results from setting arg.name and arg.value.
+
+    An equal sign in the new name, e.g. in a section heading that is no
+    longer at the start of a line, is taken as the separator. None means
+    that the argument becomes positional.
+    """
+    if '=' not in name:
+        return name
+    shadow_match = type(arg)(sep + name + '=' + value)._shadow_match
+    if not shadow_match['eq']:
+        return None
+    return name[: shadow_match.start('eq') - 1]
+
+
+class _Formatter:
+    """Render the pformat of a read-only WikiText view.
+
+    Editing a copy in place resets the cached shadows of the spans that end
+    after the edit. Until then, the shadows cached at parse time are used,
+    which might split the arguments differently. Nodes whose shadow would
+    have been reset are formatted from a detached copy of their object, see
+    `_obj`.
+    """
+
+    __slots__ = (
+        'indent',
+        'lststr',
+        'string',
+        'type_to_spans',
+        'root',
+        'first_removed',
+        'first_edit',
+        'template_edit_starts',
+    )
+
+    def __init__(self, view, indent: str, remove_comments: bool) -> None:
+        self.indent = indent
+        self.lststr = view._lststr
+        self.string = self.lststr[0]
+        self.type_to_spans = view._type_to_spans
+        self.root, self.first_removed = _node_tree(view, remove_comments)
+        # The start of the first template that formatting edits, set once
+        # all the templates are formatted.
+        self.first_edit = inf
+        self.template_edit_starts: list[int] = []
+
+    def format(self, b: int, e: int) -> str:
+        root = self.root
+        if root.has_pf:
+            # Parser functions are formatted after all the templates.
+            self._format_templates(root.kids)
+        self.first_edit = min(self.template_edit_starts, default=inf)
+        return self._render(root, b, e, True)
+
+    def _format_templates(self, nodes: list[_Node]):
+        for node in nodes:
+            if node.kind == TEMPLATE:
+                self._template_text(node, False)
+            self._format_templates(node.kids)
+
+    def _render(self, parent: _Node, b: int, e: int, final: bool) -> str:
+        """Return the rendered text of parent in [b, e).
+
+        While `final` is False, parser functions are left unchanged; that is
+        what the templates are formatted against.
+        """
+        string = self.string
+        parts = []
+        append = parts.append
+        kids = parent.kids
+        for kid in islice(kids, bisect_left(parent.kid_starts, b), None):
+            ks = kid.start
+            if ks >= e:
+                break
+            append(string[b:ks])
+            kind = kid.kind
+            if kind == TEMPLATE:
+                append(self._template_text(kid, final))
+            elif kind == PARSER_FUNCTION:
+                if final:
+                    append(self._parser_function_text(kid))
+                else:
+                    append(self._render(kid, ks, kid.end, False))
+            # else: a removed comment
+            b = kid.end
+        append(string[b:e])
+        return ''.join(parts)
+
+    def _any_edited(self, kids: list[_Node], kind: int) -> bool:
+        """Return True if formatting any `kind` node under kids edits it."""
+        for kid in kids:
+            if kid.kind == kind:
+                if kind == TEMPLATE:
+                    self._template_text(kid, False)
+                else:
+                    self._parser_function_text(kid)
+                if kid.edited:
+                    return True
+            elif self._any_edited(kid.kids, kind):
+                return True
+        return False
+
+    def _obj(self, node: _Node, detached: bool):
+        """Return the object of node, or a copy with a fresh shadow.
+
+        The copy is kept on the node. The arguments of an object are
+        registered under the id of its span, so the span must not be
+        garbage collected while formatting, or its id might be reused.
+        """
+        if not detached:
+            return node.obj
+        obj = node.detached
+        if obj is None:
+            obj = node.obj
+            obj = node.detached = type(obj)(
+                self.lststr,
+                self.type_to_spans,
+                [node.start, node.end, None, None],
+                obj._type,
+            )
+        return obj
+
+    def _split_args(self, node: _Node, args: list, final: bool) -> tuple:
+        """Return the rendered parts and the name spans of the arguments.
+
+        The parts are the separator, the name (None for positional
+        arguments), and the value of each argument.
+        """
+        string = self.string
+        render = self._render
+        seps, names, values, name_spans = [], [], [], []
+        for arg in args:
+            s, e, _, _ = arg._span_data
+            shadow_match = arg._shadow_match
+            seps.append(string[s])
+            if shadow_match['eq']:
+                name_span = s + 1, s + shadow_match.end('pre_eq')
+                names.append(render(node, *name_span, final))
+                s += shadow_match.start('post_eq')
+            else:
+                name_span = None
+                names.append(None)
+                s += 1
+            name_spans.append(name_span)
+            values.append(render(node, s, e, final))
+        return seps, names, values, name_spans
+
+    def _template_text(self, node: _Node, final: bool) -> str:
+        # Parser functions do not affect the formatting of templates.
+        final = final and node.has_pf
+        text = node.text if final else node.draft
+        if text is None:
+            text = self._format_template(node, final)
+            if final:
+                node.text = text
+            else:
+                node.draft = text
+        return text
+
+    def _format_template(self, node: _Node, final: bool) -> str:
+        ws = WS
+        render = self._render
+        s, e = node.start, node.end
+        edited = self._any_edited(node.kids, TEMPLATE)
+        is_detached = edited or self.first_removed < e
+        template = self._obj(node, is_detached)
+        name_end = s + 2 + len(template.name)
+        tl_name = render(node, s + 2, name_end, final)
+        stripped_tl_name = tl_name.strip(ws)
+        if len(stripped_tl_name) != len(tl_name):
+            self.template_edit_starts.append(s)
+            edited = True
+            if not is_detached:
+                template = self._obj(node, True)
+        tl_name = (
+            ' ' + stripped_tl_name + ' '
+            if stripped_tl_name[0] == '{'
+            else stripped_tl_name
+        )
+        args = template.arguments
+        if not args:
+            if edited:
+                node.edited = True
+            return '{{' + tl_name + render(node, name_end, e, final)
+        self.template_edit_starts.append(s)
+        node.edited = True
+        level = node.obj.nesting_level
+        seps, names, values, name_spans = self._split_args(node, args, final)
+        self._format_template_args(
+            level,
+            ':' not in stripped_tl_name,
+            args,
+            seps,
+            names,
+            values,
+            self._name_widths(node, args, names, name_spans, final),
+        )
+        return (
+            '{{'
+            + tl_name
+            + '\n'
+            + self.indent * level
+            + _join_args(seps, names, values)
+            + render(node, args[-1]._span_data[1], e, final)
+        )
+
+    def _name_widths(
+        self,
+        node: _Node,
+        args: list,
+        names: list,
+        name_spans: list,
+        final: bool,
+    ) -> list[tuple[str, int]]:
+        """Return the stripped name and the display width of each argument.
+
+        The width of positional arguments is 0. Alignment is done before the
+        parser functions in the names change.
+        """
+        ws = WS
+        widths = []
+        append = widths.append
+        kid_starts = node.kid_starts
+        position = 1
+        for arg, name, name_span in zip(args, names, name_spans):
+            if name is None:
+                append((str(position), 0))
+            else:
+                stripped_name = name.strip(ws)
+                aligned_name = stripped_name
+                if final:
+                    i = bisect_left(kid_starts, name_span[0])
+                    if i < len(kid_starts) and kid_starts[i] < name_span[1]:
+                        aligned_name = self._render(
+                            node, *name_span, False
+                        ).strip(ws)
+                width = wcswidth(aligned_name.replace('لا', '?'))
+                append((stripped_name, width))
+            if b'=' not in arg._shadow_match[0]:
+                position += 1
+        return widths
+
+    def _format_template_args(
+        self,
+        level: int,
+        not_a_parser_function: bool,
+        args: list,
+        seps: list,
+        names: list,
+        values: list,
+        widths: list[tuple[str, int]],
+    ):
+        """Format the names and values of the arguments of a template.
+
+        The arguments are formatted from the last one to the first, and the
+        first positional argument with significant whitespace stops the
+        conversion of the ones before it. If the name of the template has a
+        colon, it might be a parser function and the whitespace of its
+        arguments is kept. names and values are modified in place.
+        """
+        ws = WS
+        indent = self.indent
+        newline_indent = '\n' + indent * level
+        max_name_len = max([w for _, w in widths])
+
+        def aligned_name(i: int, value: str) -> str | None:
+            stripped_name, width = widths[i]
+            return _renamed(
+                args[i],
+                seps[i],
+                ' ' + stripped_name + ' ' + ' ' * (max_name_len - width),
+                value,
+            )
+
+        # Special formatting for the last argument.
+        if level == 1:
+            last_comment_indent = '<!--\n-->'
+        else:
+            last_comment_indent = '<!--\n' + indent * (level - 2) + ' -->'
+        last_value = values[-1]
+        last_stripped_value = last_value.strip(ws)
+        last_is_positional = names[-1] is None
+        if last_is_positional and last_value != last_stripped_value:
+            stop_conversion = True
+            if not last_value.endswith('\n' + indent * (level - 1)):
+                values[-1] = last_value + last_comment_indent
+        elif not_a_parser_function:
+            stop_conversion = False
+            names[-1] = aligned_name(-1, last_value)
+            values[-1] = (
+                ' ' + last_stripped_value + '\n' + indent * (level - 1)
+            )
+        elif last_is_positional:
+            # (last_value == last_stripped_value
+            # and not_a_parser_function is not True)
+            stop_conversion = True
+            # Can't strip or adjust the position of the value
+            # because this could be a positional argument in a template.
+            values[-1] = last_value + last_comment_indent
+        else:
+            stop_conversion = True
+            # This is either a parser function or a keyword
+            # argument in a template. In both cases the name
+            # can be lstripped and the value can be rstripped.
+            names[-1] = ' ' + names[-1].lstrip(ws)
+            if not last_value.endswith('\n' + indent * (level - 1)):
+                names[-1] = _renamed(
+                    args[-1], seps[-1], names[-1], last_value
+                )
+                values[-1] = last_value.rstrip(ws) + ' ' + last_comment_indent
+        comment_indent = '<!--\n' + indent * (level - 1) + ' -->'
+        for i in range(len(args) - 2, -1, -1):
+            value = values[i]
+            stripped_value = value.strip(ws)
+            # Positional arguments of templates are sensitive to
+            # whitespace. See:
+            # https://meta.wikimedia.org/wiki/Help:Newlines_and_spaces
+            if stop_conversion:
+                if not value.endswith(newline_indent):
+                    values[i] = value + comment_indent
+            elif names[i] is None and value != stripped_value:
+                stop_conversion = True
+                if not value.endswith(newline_indent):
+                    values[i] = value + comment_indent
+            elif not_a_parser_function:
+                names[i] = aligned_name(i, value)
+                values[i] = ' ' + stripped_value + newline_indent
+
+    def _parser_function_text(self, node: _Node) -> str:
+        text = node.text
+        if text is None:
+            text = node.text = self._format_parser_function(node)
+        return text
+
+    def _format_parser_function(self, node: _Node) -> str:
+        ws = WS
+        s, e = node.start, node.end
+        edited = self._any_edited(node.kids, PARSER_FUNCTION)
+        is_detached = (
+            edited or self.first_removed < e or self.first_edit < e
+        )
+        func = self._obj(node, is_detached)
+        name_end = s + 2 + len(func.name)
+        name = self._render(node, s + 2, name_end, True)
+        ls_name = name.lstrip(ws)
+        if len(ls_name) != len(name):
+            edited = True
+            if not is_detached:
+                func = self._obj(node, True)
+        args = func.arguments
+        if not args or ls_name.lower() in ('#tag', '#invoke', ''):
+            # The 2nd argument of `tag` parser function is an exception
+            # and cannot be stripped.
+            # So in `{{#tag:tagname|arg1|...}}`, no whitespace should be
+            # added/removed to/from arg1.
+            # See: [[mw:Help:Extension:ParserFunctions#Miscellaneous]]
+            # All args of #invoke are also whitespace-sensitive.
+            if edited:
+                node.edited = True
+            return '{{' + ls_name + self._render(node, name_end, e, True)
+        seps, names, values, _ = self._split_args(node, args, True)
+        if self._format_parser_function_args(node, names, values):
+            edited = True
+        if edited:
+            node.edited = True
+        return (
+            '{{'
+            + ls_name
+            + _join_args(seps, names, values)
+            + self._render(node, args[-1]._span_data[1], e, True)
+        )
+
+    def _format_parser_function_args(
+        self, node: _Node, names: list, values: list
+    ) -> bool:
+        """Format the arguments of a parser function in place.
+
+        Return True if any of the names or values is changed.
+        """
+        # Whitespace, including newlines, tabs, and spaces is stripped
+        # from the beginning and end of all the parameters of
+        # parser functions. See:
+        # www.mediawiki.org/wiki/Help:Extension:ParserFunctions#
+        #    Stripping_whitespace
+        ws = WS
+        indent = self.indent
+        short_indent = '\n' + indent * (node.obj.nesting_level - 1)
+        newline_indent = short_indent + indent
+        last = len(values) - 1
+        edited = False
+        for i, (name, value) in enumerate(zip(names, values)):
+            # The first argument starts on a new line and the last one
+            # ends with the short indent.
+            head = newline_indent if i == 0 else ' '
+            tail = short_indent if i == last else newline_indent
+            if name is None:
+                values[i] = head + value.strip(ws) + tail
+            else:
+                # Note that we don't add spaces before and after the
+                # '=' in parser functions because it could be part of
+                # an ordinary string.
+                names[i] = head + name.lstrip(ws)
+                values[i] = value.rstrip(ws) + tail
+                if len(names[i]) != len(name):
+                    edited = True
+            if len(values[i]) != len(value):
+                edited = True
+        return edited
+
+
+def pformat(view, indent: str, remove_comments: bool) -> str:
+    """Return the pformat of a read-only WikiText view of a node."""
+    vs, ve, _, _ = view._span_data
+    return _Formatter(view, indent, remove_comments).format(vs, ve)
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from bisect import insort_right
-from collections.abc import Mapping
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping
+from typing import Any
 from ._cell import (
     INLINE_HAEDER_CELL_MATCH,
     INLINE_NONHAEDER_CELL_MATCH,
@@ -14,6 +15,11 @@ from ._wikitext import WS
 
 from ._table_utils import CAPTION_MATCH, T, FIND_ROWS, HEAD_DIGITS, FIRST_NON_CAPTION_LINE
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
 
 def head_int(value):
     if value is None:
@@ -23,11 +29,29 @@ def head_int(value):
 
 
 class Table(SubWikiTextWithAttrs):
-    __slots__ = '_attrs_match_cache'
+    __slots__ = '_attrs_match_cache', '_structure_cache'
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._attrs_match_cache = None, None
+        self._structure_cache: list | None = None
+
+    @property
+    def _structure(self) -> list:
+        """Return the cached structure of the table.
+
+        The structure is a list of [key, table_shadow, match_table,
+        data_attrs, cells_attrs, row_attrs, caption_match, cell_span_index]
+        where every item after the key is computed on first use by the
+        relevant property or method.
+        The key changes when the document is mutated or new table spans are
+        found, and then all the items are computed again.
+        """
+        key = self._lststr.version, len(self._type_to_spans['Table'])
+        cache = self._structure_cache
+        if cache is None or cache[0] != key:
+            cache = self._structure_cache = [key] + [None] * 7
+        return cache
 
     @property
     def nesting_level(self) -> int:
@@ -40,8 +64,15 @@ class Table(SubWikiTextWithAttrs):
 
     @property
     def _table_shadow(self) -> bytearray:
-        """Remove Table spans from shadow and return it."""
-        shadow = self._shadow[:]
+        """Remove Table spans from shadow and return it.
+
+        The result is cached and must not be modified.
+        """
+        structure = self._structure
+        shadow = structure[1]
+        if shadow is not None:
+            return shadow
+        shadow = structure[1] = self._shadow[:]
         ss = self._span_data[0]
         for s, e, _, _ in self._subspans('Table'):
             if s == ss:
@@ -51,7 +82,18 @@ class Table(SubWikiTextWithAttrs):
 
     @property
     def _match_table(self) -> list[list[Any]]:
-        """Return match_table."""
+        """Return match_table.
+
+        The result is cached and must not be modified.
+        """
+        structure = self._structure
+        match_table = structure[2]
+        if match_table is None:
+            match_table = structure[2] = [*self._iter_match_rows()]
+        return match_table
+
+    def _iter_match_rows(self) -> Iterator[list[Any]]:
+        """Yield the cell matches of each row, one row at a time."""
         table_shadow = self._table_shadow
         # Remove table-start and table-end marks.
         pos = table_shadow.find(10)  # ord('\n')
@@ -64,9 +106,9 @@ class Table(SubWikiTextWithAttrs):
                 pos = nlp
                 lsp = _lstrip_increase(table_shadow, pos)
         except IndexError:
-            return [[]]
+            yield []
+            return
         # Start of the first row
-        match_table = []
         pos = FIRST_NON_CAPTION_LINE(table_shadow, pos).start()
         rsp = _row_separator_increase(table_shadow, pos)
         pos = -1
@@ -77,7 +119,6 @@ class Table(SubWikiTextWithAttrs):
             # Don't add a row if there are no new cells.
             if m:
                 match_row = []  # type: List[Any]
-                match_table.append(match_row)
                 while m is not None:
                     match_row.append(m)
                     sep = m['sep']
@@ -96,8 +137,8 @@ class Table(SubWikiTextWithAttrs):
                             m = INLINE_HAEDER_CELL_MATCH(table_shadow, pos)
                     pos = FIRST_NON_CAPTION_LINE(table_shadow, pos).start()
                     m = NEWLINE_CELL_MATCH(table_shadow, pos)
+                yield match_row
             rsp = _row_separator_increase(table_shadow, pos)
-        return match_table
 
     def data(
         self,
@@ -123,43 +164,12 @@ class Table(SubWikiTextWithAttrs):
         # Note string is only used for extracting data, matching is done over
         # the shadow.
         string = self.string
-        table_data = []  # type: List[List[str]]
-        if strip:
-            for match_row in match_table:
-                row_data = []  # type: List[str]
-                table_data.append(row_data)
-                for m in match_row:
-                    # Spaces after the first newline can be meaningful
-                    s, e = m.span('data')
-                    row_data.append(string[s:e].lstrip(' ').rstrip(WS))
-        else:
-            for match_row in match_table:
-                row_data = []
-                table_data.append(row_data)
-                for m in match_row:
-                    s, e = m.span('data')
-                    row_data.append(string[s:e])
+        table_data = [
+            _row_data(string, match_row, strip) for match_row in match_table
+        ]
         if table_data:
             if span:
-                table_attrs = []  # type: List[List[Dict[str, str]]]
-                for match_row in match_table:
-                    row_attrs = []  # type: List[Dict[str, str]]
-                    table_attrs.append(row_attrs)
-                    row_attrs_append = row_attrs.append
-                    for m in match_row:
-                        s, e = m.span('attrs')
-                        captures = ATTRS_MATCH(
-                            string.encode('ascii', 'replace'), s, e
-                        ).captures
-                        row_attrs_append(
-                            dict(
-                                zip(
-                                    captures('attr_name'),
-                                    captures('attr_value'),
-                                )
-                            )
-                        )
-                table_data = _apply_attr_spans(table_attrs, table_data)
+                table_data = _apply_attr_spans(self._data_attrs, table_data)
         if row is None:
             if column is None:
                 return table_data
@@ -168,6 +178,135 @@ class Table(SubWikiTextWithAttrs):
             return table_data[row]
         return table_data[row][column]
 
+    def iter_rows(
+        self, span: bool = True, strip: bool = True
+    ) -> Iterator[list[str | None]]:
+        """Yield the data of each row as soon as it is matched.
+
+        The rows are the same as the rows of `self.data(span, strip)`, but
+        only the current row and the rows reached by its rowspans are kept in
+        memory. As a result, when `span` is True, a row is not padded with
+        None if a later row makes the table wider.
+        """
+        match_rows = self._structure[2]
+        if match_rows is None:
+            match_rows = self._iter_match_rows()
+        # Note string is only used for extracting data, matching is done over
+        # the shadow.
+        string = self.string
+        if not span:
+            for match_row in match_rows:
+                yield _row_data(string, match_row, strip)
+            return
+        encoded_string = string.encode('ascii', 'replace')
+        yield from _iter_attr_spans(
+            (
+                _row_cell_attrs(encoded_string, match_row),
+                _row_data(string, match_row, strip),
+            )
+            for match_row in match_rows
+        )
+
+    def to_columns(
+        self, header_rows: int = 1, dtype_inference: bool = True
+    ) -> dict[str, Any]:
+        """Return a dict mapping column names to column values.
+
+        :param header_rows: Number of rows at the top of the table that are
+            joined to form the column names. Columns without a name are named
+            by their zero-based index and repeated names get a `.n` suffix.
+        :param dtype_inference: Convert the columns whose non-empty values are
+            all integers, or all floats, to numbers.
+
+        The values are the same as in `self.data()`, i.e. with spans applied
+        and stripped, but the columns are filled while the rows are matched.
+        Columns are NumPy arrays if numpy is installed and lists otherwise.
+        Empty cells of numeric columns are NaN in NumPy arrays and None in
+        lists.
+        """
+        columns = []  # type: List[List[Optional[str]]]
+        for y, row in enumerate(self.iter_rows()):
+            # Rows never get narrower. Like `_apply_attr_spans`, fill the
+            # slots of earlier rows in a new column with None.
+            for _ in range(len(row) - len(columns)):
+                columns.append([None] * y)
+            for column, value in zip(columns, row):
+                column.append(value)
+        result = {}
+        for i, column in enumerate(columns):
+            parts = []  # type: List[str]
+            for value in column[:header_rows]:
+                # Skip repeated values of colspan and rowspan headers.
+                if value and (not parts or parts[-1] != value):
+                    parts.append(value)
+            name = ' '.join(parts) or str(i)
+            if name in result:
+                n = 1
+                while f'{name}.{n}' in result:
+                    n += 1
+                name = f'{name}.{n}'
+            result[name] = _to_column(column[header_rows:], dtype_inference)
+        return result
+
+    def update_cells(
+        self, values: Mapping[tuple[int, int], str], span: bool = True
+    ) -> None:
+        """Set the values of the given cells in a single edit.
+
+        :param values: A mapping from (row, column) to the new value of the
+            cell at that position. The zero-based indices are the same as in
+            `self.data(span)`. If several positions refer to the same spanned
+            cell, the last one is used.
+        :param span: Apply rowspans and colspans to the indices, see `data`.
+
+        Like in `data` with `strip=True`, the whitespace around the old
+        values is not considered a part of them and is kept, as are the
+        attributes of the cells. Raise ValueError if there is no cell at one
+        of the given positions, e.g. if an index is negative or out of range.
+        """
+        match_table = self._match_table
+        if span and match_table:
+            match_table = _apply_attr_spans(self._data_attrs, match_table)
+        string = self.string
+        edits = {}
+        for (row, column), value in values.items():
+            # Reject negative indices instead of counting from the end.
+            match_row = match_table[row] if 0 <= row < len(match_table) else ()
+            m = match_row[column] if 0 <= column < len(match_row) else None
+            if m is None:
+                raise ValueError(f'there is no cell at {(row, column)!r}')
+            s, e = m.span('data')
+            old_value = string[s:e]
+            stop = s + len(old_value.rstrip(WS))
+            # Spaces after the first newline can be meaningful
+            s += len(old_value) - len(old_value.lstrip(' '))
+            edits[m.start()] = s, max(s, stop), value
+        self._replace_ranges(sorted(edits.values()))
+
+    def set_data(
+        self, grid: Iterable[Iterable[str | None]], span: bool = True
+    ) -> None:
+        """Set the values of the cells from a grid shaped like `data`.
+
+        Only the values that differ from `self.data(span)` are written, all
+        in a single edit by `update_cells`. None values are skipped, and so
+        are the rows and columns that are missing from the end of the grid.
+        Like `update_cells`, raise ValueError if a value that is not None
+        has no cell, e.g. if the grid is larger than the table.
+        """
+        table_data = self.data(span)
+        rows_len = len(table_data)
+        values = {}
+        for row, row_values in enumerate(grid):
+            table_row = table_data[row] if row < rows_len else ()
+            columns_len = len(table_row)
+            for column, value in enumerate(row_values):
+                if value is not None and (
+                    column >= columns_len or value != table_row[column]
+                ):
+                    values[row, column] = value
+        self.update_cells(values, span)
+
     def cells(
         self,
         row: int = None,
@@ -193,38 +332,34 @@ class Table(SubWikiTextWithAttrs):
         type_ = id(tbl_span)
         type_to_spans = self._type_to_spans
         spans = type_to_spans.setdefault(type_, [])
+        span_index = self._cell_span_index(spans)
+        span_tuple_to_span_get = span_index.get
+        new_spans = []
         table_cells = []  # type: List[List[Cell]]
-        table_attrs = []  # type: List[List[Dict[str, str]]]
+        if span:
+            table_attrs_matches = self._cells_attrs[0]
         attrs_match = None
-        for match_row in match_table:
+        for i, match_row in enumerate(match_table):
             row_cells = []  # type: List[Cell]
             table_cells.append(row_cells)
             if span:
-                row_attrs = []  # type: List[Dict[str, str]]
-                table_attrs.append(row_attrs)
-                row_attrs_append = row_attrs.append
-            for m in match_row:
+                # noinspection PyUnboundLocalVariable
+                row_attrs_matches = table_attrs_matches[i]
+            for j, m in enumerate(match_row):
                 header = m['sep'] == b'!'
                 ms, me = m.span()
-                cell_span = [ss + ms, ss + me, None, shadow[ms:me]]
                 if span:
-                    s, e = m.span('attrs')
-                    # Note: ATTRS_MATCH always matches, even to empty strings.
-                    # Also ATTRS_MATCH should match against the cell string
-                    # so that it can be used easily as cache later in Cells.
-                    attrs_match = ATTRS_MATCH(shadow[ms:me], s - ms, e - ms)
-                    captures = attrs_match.captures
                     # noinspection PyUnboundLocalVariable
-                    row_attrs_append(
-                        dict(
-                            zip(captures('attr_name'), captures('attr_value'))
-                        )
-                    )
-                old_span = next((s for s in spans if s == cell_span), None)
-                if old_span is None:
-                    insort_right(spans, cell_span)
-                else:
-                    cell_span = old_span
+                    attrs_match = row_attrs_matches[j]
+                span_tuple = ss + ms, ss + me
+                cell_span = span_tuple_to_span_get(span_tuple)
+                if cell_span is None:
+                    cell_span = span_index[span_tuple] = [
+                        *span_tuple,
+                        None,
+                        shadow[ms:me],
+                    ]
+                    new_spans.append(cell_span)
                 row_cells.append(
                     Cell(
                         self._lststr,
@@ -236,8 +371,12 @@ class Table(SubWikiTextWithAttrs):
                         attrs_match,
                     )
                 )
+        if new_spans:
+            spans += new_spans
+            spans.sort()
+            self._structure[7] = len(spans), span_index
         if table_cells and span:
-            table_cells = _apply_attr_spans(table_attrs, table_cells)
+            table_cells = _apply_attr_spans(self._cells_attrs[1], table_cells)
         if row is None:
             if column is None:
                 return table_cells
@@ -246,10 +385,89 @@ class Table(SubWikiTextWithAttrs):
             return table_cells[row]
         return table_cells[row][column]
 
+    def _cell_span_index(
+        self, spans: list[list]
+    ) -> dict[tuple[int, int], list]:
+        """Return a dict mapping (start, end) to the cell spans of the table.
+
+        The index is reused by later calls while the cell spans of the table
+        remain the same.
+        """
+        structure = self._structure
+        cached = structure[7]
+        if cached is not None and cached[0] == len(spans):
+            return cached[1]
+        # Iterate in reverse so that the first of any duplicate spans wins.
+        span_index = {(s[0], s[1]): s for s in reversed(spans)}
+        structure[7] = len(spans), span_index
+        return span_index
+
+    @property
+    def _data_attrs(self) -> list[list[dict[bytes, bytes]]]:
+        """Return the attributes of each cell of `_match_table` for `data`.
+
+        Unlike `_cells_attrs`, the attributes are matched against the string
+        of the table, not its shadow. The result is cached.
+        """
+        structure = self._structure
+        table_attrs = structure[3]
+        if table_attrs is not None:
+            return table_attrs
+        encoded_string = self.string.encode('ascii', 'replace')
+        table_attrs = structure[3] = [
+            _row_cell_attrs(encoded_string, match_row)
+            for match_row in self._match_table
+        ]
+        return table_attrs
+
+    @property
+    def _cells_attrs(
+        self,
+    ) -> tuple[list[list[Any]], list[list[dict[bytes, bytes]]]]:
+        """Return the attribute matches and dicts of each cell for `cells`.
+
+        The result is cached.
+        """
+        structure = self._structure
+        cells_attrs = structure[4]
+        if cells_attrs is not None:
+            return cells_attrs
+        shadow = self._shadow
+        table_attrs_matches = []
+        table_attrs = []
+        for match_row in self._match_table:
+            row_attrs_matches = []
+            table_attrs_matches.append(row_attrs_matches)
+            row_attrs = []  # type: List[Dict[bytes, bytes]]
+            table_attrs.append(row_attrs)
+            for m in match_row:
+                ms, me = m.span()
+                s, e = m.span('attrs')
+                # Note: ATTRS_MATCH always matches, even to empty strings.
+                # Also ATTRS_MATCH should match against the cell string
+                # so that it can be used easily as cache later in Cells.
+                attrs_match = ATTRS_MATCH(shadow[ms:me], s - ms, e - ms)
+                row_attrs_matches.append(attrs_match)
+                captures = attrs_match.captures
+                row_attrs.append(
+                    dict(zip(captures('attr_name'), captures('attr_value')))
+                )
+        cells_attrs = structure[4] = table_attrs_matches, table_attrs
+        return cells_attrs
+
+    @property
+    def _caption_match(self) -> Any:
+        """Return the cached CAPTION_MATCH of the shadow."""
+        structure = self._structure
+        m = structure[6]
+        if m is None:
+            m = structure[6] = CAPTION_MATCH(self._shadow) or False
+        return m
+
     @property
     def caption(self) -> str | None:
         """Caption of the table. Support get and set."""
-        m = CAPTION_MATCH(self._shadow)
+        m = self._caption_match
         if m:
             return self(*m.span('caption'))
         return None
@@ -257,7 +475,7 @@ class Table(SubWikiTextWithAttrs):
     @caption.setter
     def caption(self, newcaption: str) -> None:
         shadow = self._shadow
-        m = CAPTION_MATCH(shadow)
+        m = self._caption_match
         if m:
             s = m.end('attrs')
             self[s if s != -1 else m.end('preattrs') : m.end('caption')] = (
@@ -283,7 +501,7 @@ class Table(SubWikiTextWithAttrs):
     @property
     def caption_attrs(self) -> str | None:
         """Caption attributes. Support get and set operations."""
-        m = CAPTION_MATCH(self._shadow)
+        m = self._caption_match
         if m:
             s, e = m.span('attrs')
             if s != -1:
@@ -294,7 +512,7 @@ class Table(SubWikiTextWithAttrs):
     def caption_attrs(self, attrs: str) -> None:
         shadow = self._shadow
         h, s, t = shadow.partition(b'\n')
-        m = CAPTION_MATCH(shadow)
+        m = self._caption_match
         if not m:  # There is no caption-line
             self.insert(len(h + s), '|+' + attrs + '|\n')
         else:  # Caption and attrs or Caption but no attrs
@@ -309,9 +527,13 @@ class Table(SubWikiTextWithAttrs):
         Use the setter of this property to set attributes for all rows.
         Note that it will overwrite all the existing attr values.
         """
+        structure = self._structure
+        attrs = structure[5]
+        if attrs is not None:
+            return [{**d} for d in attrs]
         shadow = self._table_shadow
         string = self.string
-        attrs = []
+        attrs = structure[5] = []
         append = attrs.append
         for row_match in FIND_ROWS(shadow):
             s, e = row_match.span(1)
@@ -324,7 +546,7 @@ class Table(SubWikiTextWithAttrs):
                     )
                 }
             )
-        return attrs
+        return [{**d} for d in attrs]
 
     @row_attrs.setter
     def row_attrs(self, attrs: list[Mapping]):
@@ -344,55 +566,140 @@ class Table(SubWikiTextWithAttrs):
             )
 
 
+def _row_data(string: str, match_row: list[Any], strip: bool) -> list[str]:
+    """Return the data of the cells of a row of `_match_table`."""
+    if strip:
+        # Spaces after the first newline can be meaningful
+        return [
+            string[s:e].lstrip(' ').rstrip(WS)
+            for s, e in [m.span('data') for m in match_row]
+        ]
+    return [string[s:e] for s, e in [m.span('data') for m in match_row]]
+
+
+def _row_cell_attrs(
+    encoded_string: bytes, match_row: list[Any]
+) -> list[dict[bytes, bytes]]:
+    """Return the attributes of the cells of a row of `_match_table`."""
+    row_attrs = []  # type: List[Dict[bytes, bytes]]
+    row_attrs_append = row_attrs.append
+    for m in match_row:
+        s, e = m.span('attrs')
+        captures = ATTRS_MATCH(encoded_string, s, e).captures
+        row_attrs_append(
+            dict(zip(captures('attr_name'), captures('attr_value')))
+        )
+    return row_attrs
+
+
+def _to_column(values: list[str | None], dtype_inference: bool) -> Any:
+    """Return values as a NumPy array, or as a list if numpy is missing."""
+    if np is None:
+        if dtype_inference and any(values):
+            for convert in (int, float):
+                try:
+                    return [convert(v) if v else None for v in values]
+                except ValueError:
+                    continue
+        return [*values]
+    if dtype_inference:
+        strings = np.array(['' if v is None else v for v in values], dtype=str)
+        filled = strings != ''
+        numbers = strings[filled]
+        if numbers.size:
+            for dtype in (np.int64, np.float64):
+                try:
+                    numbers = numbers.astype(dtype)
+                except (ValueError, OverflowError):
+                    continue
+                if filled.all():
+                    return numbers
+                column = np.full(strings.size, np.nan)
+                column[filled] = numbers
+                return column
+    return np.array(values, dtype=object)
+
+
 def _apply_attr_spans(
     table_attrs: list[list[dict[str, str]]], table_data: list[list[T]]
 ) -> list[list[T]]:
     """Apply row and column spans and return table_data."""
+    # Table.data won't call this function if table_data is empty.
+    # 5
+    # if not table_data:
+    #     return table_data
+    table = [*_iter_attr_spans(zip(table_attrs, table_data))]
+    # Rows that were yielded before the table grew wider are shorter.
+    xwidth = max(map(len, table))
+    for r in table:
+        if xwidth > len(r):
+            r.extend([None] * (xwidth - len(r)))
+    return table
+
+
+def _iter_attr_spans(
+    attrs_and_rows: Iterable[tuple[list[dict[str, str]], list[T]]],
+) -> Iterator[list[T | None]]:
+    """Apply row and column spans and yield each row once it is complete.
+
+    Only the rows that are reached by the current rowspans are kept. The
+    yielded rows are not widened if the table grows wider afterwards.
+
+    Until a row is yielded, it is stored as a list of (start, stop, cell)
+    runs in the order that they were placed. Therefore a span is stored
+    once, no matter how wide it is, widening the table does not touch the
+    stored rows, and later runs overwrite earlier ones on expansion just
+    like overlapping cells do in a dense grid.
+    """
     # The following code is based on the table forming algorithm described
     # at http://www.w3.org/TR/html5/tabular-data.html#processing-model-1
     # Numeral comments indicate the steps in that algorithm.
     # 1, 2, 10
-    ycurrent = yheight = xwidth = 0
+    xwidth = 0
     # 4
-    # The xwidth and yheight variables give the table's dimensions.
-    # The table is initially empty.
-    table = []  # type: List[List[Optional[T]]]
+    # The xwidth variable gives the table's width. `table` holds the runs
+    # of the rows from ycurrent to yheight, i.e. the current row and the
+    # ones that already have cells spanning into them.
+    table = deque()  # type: Deque[List[Tuple[int, int, T]]]
     append_row = table.append
-    # Table.data won't call this function if table_data is empty.
-    # 5
-    # if not table_data:
-    #     return table_data
     # 11
-    downward_growing_cells: list[tuple[T | None, int, int]] = []
+    downward_growing_cells: list[tuple[int, int, T]] = []
     # 13, 18
     # Algorithm for processing rows
-    for attrs_row, row in zip(table_attrs, table_data):
+    for attrs_row, row in attrs_and_rows:
         # 13.1 ycurrent is never greater than yheight
-        if yheight == ycurrent:
-            yheight += 1
-            append_row([None] * xwidth)
+        if not table:
+            append_row([])
+        current_runs = table[0]
         # 13.2
         xcurrent = 0
         # 13.3
         # The algorithm for growing downward-growing cells
-        for cell, cellx, width in downward_growing_cells:
-            r = table[ycurrent]
-            for x in range(cellx, cellx + width):
-                r[x] = cell
+        current_runs += downward_growing_cells
+        # Cells of this row are placed after xcurrent, so only the runs that
+        # were placed by the previous rows can occupy the next slots.
+        if current_runs:
+            occupied = sorted([run[:2] for run in current_runs])
+            occupied_len = len(occupied)
+        else:
+            occupied_len = 0
+        i = 0
         # 13.4 will be handled by the following for-loop.
         # 13.5, 13.16
         for attrs, current_cell in zip(attrs_row, row):
             # 13.6
             attrs_get = attrs.get
-            while xcurrent < xwidth and table[ycurrent][xcurrent] is not None:
-                xcurrent += 1
+            while i < occupied_len:
+                start, stop = occupied[i]
+                if start > xcurrent:
+                    break
+                if stop > xcurrent:
+                    xcurrent = stop
+                i += 1
             # 13.7
             if xcurrent == xwidth:
                 # xcurrent is never greater than xwidth
                 xwidth += 1
-                for r in table:
-                    if xwidth > len(r):
-                        r.extend([None] * (xwidth - len(r)))
             # 13.8
             colspan = head_int(attrs_get(b'colspan'))
             if colspan == 0:
@@ -412,51 +719,58 @@ def _apply_attr_spans(
             else:
                 cell_grows_downward = False
             # 13.11
-            if xwidth < xcurrent + colspan:
-                xwidth = xcurrent + colspan
-                for r in table:
-                    if xwidth > len(r):
-                        r.extend([None] * (xwidth - len(r)))
+            xstop = xcurrent + colspan
+            if xwidth < xstop:
+                xwidth = xstop
             # 13.12
-            if yheight < ycurrent + rowspan:
-                yheight = ycurrent + rowspan
-                while len(table) < yheight:
-                    append_row([None] * xwidth)
+            while len(table) < rowspan:
+                append_row([])
             # 13.13
-            for y in range(ycurrent, ycurrent + rowspan):
-                r = table[y]
-                for x in range(xcurrent, xcurrent + colspan):
-                    # If any of the slots involved already had a cell
-                    # covering them, then this is a table model error.
-                    # Those slots now have two cells overlapping.
-                    r[x] = current_cell
-                    # Skipping algorithm for assigning header cells
+            # If any of the slots involved already had a cell covering them,
+            # then this is a table model error. Those slots now have two
+            # cells overlapping. The later run wins on expansion.
+            # Skipping algorithm for assigning header cells
+            run = xcurrent, xstop, current_cell
+            if rowspan == 1:
+                current_runs.append(run)
+            else:
+                for y in range(rowspan):
+                    table[y].append(run)
             # 13.14
             if cell_grows_downward:
-                downward_growing_cells.append(
-                    (current_cell, xcurrent, colspan)
-                )
+                downward_growing_cells.append(run)
             # 13.15
-            xcurrent += colspan
+            xcurrent = xstop
         # 13.16
-        ycurrent += 1
+        yield _expand_runs(table.popleft(), xwidth)
     # 14
     # The algorithm for ending a row group
     # 14.1
-    while ycurrent < yheight:
+    while table:
         # 14.1.1
         # Run the algorithm for growing downward-growing cells.
-        for cell, cellx, width in downward_growing_cells:
-            for x in range(cellx, cellx + width):
-                table[ycurrent][x] = cell
+        current_runs = table.popleft()
+        current_runs += downward_growing_cells
         # 14.2.2
-        ycurrent += 1
+        yield _expand_runs(current_runs, xwidth)
     # 14.2
     # downward_growing_cells = []
     # 20 If there exists a row or column in the table containing only
     # slots that do not have a cell anchored to them,
     # then this is a table model error.
-    return table
+
+
+def _expand_runs(
+    runs: list[tuple[int, int, T]], xwidth: int
+) -> list[T | None]:
+    """Return the dense row of the given width that is formed by runs."""
+    row = [None] * xwidth  # type: List[Optional[T]]
+    for start, stop, cell in runs:
+        if stop - start == 1:
+            row[start] = cell
+        else:
+            row[start:stop] = [cell] * (stop - start)
+    return row
 
 
 def _lstrip_increase(shadow: bytearray, pos: int) -> int:
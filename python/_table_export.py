@@ -0,0 +1,237 @@
+"""Export the tables of many documents to CSV or Arrow IPC files."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Hashable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from csv import writer as csv_writer
+from itertools import islice
+from json import dumps
+from os import PathLike, cpu_count
+from typing import IO, NamedTuple
+from warnings import warn
+
+from ._wikitext import WikiText
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None
+
+
+class TableRecord(NamedTuple):
+    """One table of a document, as produced by `iter_table_records`."""
+
+    page_id: Hashable
+    table_index: int
+    caption: str | None
+    row_attrs: list[dict[str, str]]
+    data: list[list[str | None]]
+
+
+FIELDS = TableRecord._fields
+
+
+def _table_records(
+    document: tuple[Hashable, str],
+) -> list[TableRecord] | str:
+    """Return the records of all the tables of a (page_id, text) pair.
+
+    If the document cannot be parsed, return the error message instead, so
+    that a worker does not fail the whole export because of one document.
+    """
+    page_id, text = document
+    try:
+        return [
+            TableRecord(
+                page_id, i, table.caption, table.row_attrs, table.data()
+            )
+            for i, table in enumerate(WikiText(text).tables)
+        ]
+    except Exception as e:
+        return f'skipped the tables of {page_id!r}: {type(e).__name__}: {e}'
+
+
+def _checked(records: list[TableRecord] | str) -> list[TableRecord]:
+    """Return records, or warn and return [] if they are an error message."""
+    if isinstance(records, str):
+        warn(records, RuntimeWarning, 3)
+        return []
+    return records
+
+
+def iter_table_records(
+    documents: Iterable[tuple[Hashable, str]],
+    processes: int | None = None,
+    max_pending: int | None = None,
+) -> Iterator[TableRecord]:
+    """Yield a TableRecord for each table of each (page_id, text) document.
+
+    Tables are numbered in the order of `WikiText.tables`, i.e. nested tables
+    are included. The records are yielded in the order of the documents. If
+    parsing a document raises an exception, its tables are skipped and a
+    RuntimeWarning with its page_id and the error is issued.
+
+    :param processes: The number of worker processes that parse the
+        documents. Defaults to `os.cpu_count()`. If it is 1, the documents are
+        parsed in the current process.
+    :param max_pending: The maximum number of documents that are read from
+        `documents` but whose records are not yielded yet. Defaults to four
+        times the number of processes.
+
+    Raise ValueError if `processes` or `max_pending` is less than 1.
+    """
+    if processes is None:
+        processes = cpu_count() or 1
+    elif processes < 1:
+        raise ValueError(f'processes must be at least 1, not {processes!r}')
+    if max_pending is not None and max_pending < 1:
+        raise ValueError(
+            f'max_pending must be at least 1, not {max_pending!r}'
+        )
+    # A separate generator, so that the checks above run when called.
+    return _iter_table_records(documents, processes, max_pending)
+
+
+def _iter_table_records(
+    documents: Iterable[tuple[Hashable, str]],
+    processes: int,
+    max_pending: int | None,
+) -> Iterator[TableRecord]:
+    if processes == 1:
+        for document in documents:
+            yield from _checked(_table_records(document))
+        return
+    if max_pending is None:
+        max_pending = 4 * processes
+    documents = iter(documents)
+    with ProcessPoolExecutor(processes) as executor:
+        submit = executor.submit
+        pending = deque(
+            submit(_table_records, d) for d in islice(documents, max_pending)
+        )
+        try:
+            while pending:
+                records = _checked(pending.popleft().result())
+                for document in islice(documents, 1):
+                    pending.append(submit(_table_records, document))
+                yield from records
+        finally:
+            # Do not wait for the pending documents if the consumer stopped.
+            for future in pending:
+                future.cancel()
+
+
+def _csv_row(record: TableRecord) -> list:
+    page_id, table_index, caption, row_attrs, data = record
+    return [
+        page_id,
+        table_index,
+        caption,
+        dumps(row_attrs, ensure_ascii=False),
+        dumps(data, ensure_ascii=False),
+    ]
+
+
+def _arrow_schema() -> pa.Schema:
+    return pa.schema(
+        [
+            ('page_id', pa.string()),
+            ('table_index', pa.int64()),
+            ('caption', pa.string()),
+            ('row_attrs', pa.list_(pa.map_(pa.string(), pa.string()))),
+            ('data', pa.list_(pa.list_(pa.string()))),
+        ]
+    )
+
+
+def _arrow_batch(
+    records: list[TableRecord], schema: pa.Schema
+) -> pa.RecordBatch:
+    """Return records as a RecordBatch of the given schema.
+
+    The page_ids are converted to strings, like in CSV files, because the
+    schema of an Arrow file is fixed before the later page_ids are seen.
+    """
+    page_ids, table_indices, captions, row_attrs, data = zip(*records)
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(
+                [None if i is None else str(i) for i in page_ids],
+                schema[0].type,
+            ),
+            pa.array(table_indices, schema[1].type),
+            pa.array(captions, schema[2].type),
+            pa.array(
+                [[[*d.items()] for d in attrs] for attrs in row_attrs],
+                schema[3].type,
+            ),
+            pa.array(data, schema[4].type),
+        ],
+        schema=schema,
+    )
+
+
+def export_tables(
+    documents: Iterable[tuple[Hashable, str]],
+    file: str | PathLike | IO,
+    file_format: str = 'csv',
+    processes: int | None = None,
+    max_pending: int | None = None,
+    batch_size: int = 1024,
+) -> int:
+    """Write the tables of (page_id, text) documents to file.
+
+    Each table is one record with the fields of `TableRecord`. Return the
+    number of the written records. The documents are parsed and written as
+    they are read, see `iter_table_records` for `processes` and
+    `max_pending`.
+
+    :param file: A path, or a file object that is opened for writing text
+        with `newline=''` for CSV, or for writing bytes for Arrow.
+    :param file_format: 'csv' or 'arrow'. CSV files have a header row and
+        their row_attrs and data columns are JSON-encoded. Arrow files use
+        the IPC file format with a record batch per `batch_size` records and
+        require pyarrow. In both formats page_id is written as a string.
+    """
+    if file_format == 'csv':
+        write = _write_csv
+    elif file_format == 'arrow':
+        if pa is None:
+            raise ImportError('pyarrow is required for the arrow format')
+        write = _write_arrow
+    else:
+        raise ValueError(f'unknown file format: {file_format!r}')
+    records = iter_table_records(documents, processes, max_pending)
+    if isinstance(file, (str, PathLike)):
+        if file_format == 'csv':
+            with open(file, 'w', encoding='utf8', newline='') as f:
+                return write(records, f, batch_size)
+        with open(file, 'wb') as f:
+            return write(records, f, batch_size)
+    return write(records, file, batch_size)
+
+
+def _write_csv(records: Iterator[TableRecord], f: IO, batch_size: int) -> int:
+    writerow = csv_writer(f).writerow
+    writerow(FIELDS)
+    count = 0
+    for count, record in enumerate(records, 1):
+        writerow(_csv_row(record))
+    return count
+
+
+def _write_arrow(
+    records: Iterator[TableRecord], f: IO, batch_size: int
+) -> int:
+    count = 0
+    schema = _arrow_schema()
+    with pa.ipc.new_file(f, schema) as writer:
+        while True:
+            records_batch = [*islice(records, batch_size)]
+            if not records_batch:
+                break
+            writer.write_batch(_arrow_batch(records_batch, schema))
+            count += len(records_batch)
+    return count
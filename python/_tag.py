@@ -10,7 +10,8 @@ For more info see:
 
 from __future__ import annotations
 
-from typing import Any
+from itertools import islice
+from typing import Any, Iterator
 
 from regex import DOTALL, VERBOSE
 
@@ -206,12 +207,15 @@ class Tag(SubWikiTextWithAttrs):
             spans.sort()
         else:
             span = spans[i]
-        return SubWikiText(self._lststr, tts, span, 'SubWikiText')
+        return self._node(SubWikiText, span, 'SubWikiText')
 
     @property
     def _extension_tags(self):
         return super()._extension_tags[1:]
 
+    def iter_extension_tags(self) -> Iterator[Tag]:
+        return islice(super().iter_extension_tags(), 1, None)
+
     def get_tags(self, name=None) -> list[Tag]:
         return super().get_tags(name)[1:]
 
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-from typing import Iterable, TypeVar
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, Mapping, TypeVar
 
 from regex import REVERSE
 
-from ._argument import Argument
+from ._argument import ARG_SHADOW_FULLMATCH, Argument
 from ._comment_bold_italic import COMMENT_PATTERN
 from ._parser_function import SubWikiTextWithArgs
 from ._wikitext import WS, rc
@@ -65,35 +67,9 @@ class Template(SubWikiTextWithArgs):
             ... ).normal_name(code='en')
             'T 1'
         """
-        # Remove comments
-        name = COMMENT_SUB('', self.name).strip(WS)
-        # Remove code
-        if code:
-            head, sep, tail = name.partition(':')
-            if not head and sep:
-                name = tail.strip(' ')
-                head, sep, tail = name.partition(':')
-            if code.lower() == head.strip(' ').lower():
-                name = tail.strip(' ')
-        # Remove namespace
-        head, sep, tail = name.partition(':')
-        if not head and sep:
-            name = tail.strip(' ')
-            head, sep, tail = name.partition(':')
-        if head:
-            ns = head.strip(' ').lower()
-            for namespace in rm_namespaces:
-                if namespace.lower() == ns:
-                    name = tail.strip(' ')
-                    break
-        # Use space instead of underscore
-        name = name.replace('_', ' ')
-        if capitalize:
-            # Use uppercase for the first letter
-            name = name[:1].upper() + name[1:]
-        # Remove #anchor
-        name, sep, tail = name.partition('#')
-        return ' '.join(name.split())
+        return _normal_name(
+            self.name, tuple(rm_namespaces), code, capitalize
+        )
 
     def rm_first_of_dup_args(self) -> None:
         """Eliminate duplicate arguments by removing the first occurrences.
@@ -104,13 +80,12 @@ class Template(SubWikiTextWithArgs):
 
         Also see `rm_dup_args_safe` function.
         """
-        names = set()  # type: set
-        for a in reversed(self.arguments):
-            name = a.name.strip(WS)
-            if name in names:
-                del a[: len(a.string)]
-            else:
-                names.add(name)
+        dup_args = [
+            arg for args in self._arg_index()[1].values() for arg in args[:-1]
+        ]
+        dup_args.sort(key=lambda a: a._span_data[0], reverse=True)
+        for a in dup_args:
+            del a[: len(a.string)]
 
     def rm_dup_args_safe(self, tag: str | None = None) -> None:
         """Remove duplicate arguments in a safe manner.
@@ -134,8 +109,7 @@ class Template(SubWikiTextWithArgs):
         name_to_lastarg_vals: dict[str, tuple[Argument, list[str]]] = {}
         # Removing positional args affects their name. By reversing the list
         # we avoid encountering those kind of args.
-        for arg in reversed(self.arguments):
-            name = arg.name.strip(WS)
+        for name, arg in reversed(self._arg_index()[0]):
             if arg.positional:
                 # Value of keyword arguments is automatically stripped by MW.
                 val = arg.value
@@ -189,8 +163,7 @@ class Template(SubWikiTextWithArgs):
           argument. Ignore `preserve_spacing` if positional is True.
           If it's None, do what seems more appropriate.
         """
-        args = (*reversed(self.arguments),)
-        arg = get_arg(name, args)
+        arg = self.get_arg(name)
         # Updating an existing argument.
         if arg:
             if positional:
@@ -204,26 +177,16 @@ class Template(SubWikiTextWithArgs):
         # Adding a new argument
         if not name and positional is None:
             positional = True
+        args = [arg for _, arg in reversed(self._arg_index()[0])]
         # Calculate the whitespace needed before arg-name and after arg-value.
         if not positional and preserve_spacing and args:
-            before_names = []
-            name_lengths = []
-            before_values = []
-            after_values = []
-            for arg in args:
-                aname = arg.name
-                name_len = len(aname)
-                name_lengths.append(name_len)
-                before_names.append(STARTING_WS_MATCH(aname)[0])
-                arg_value = arg.value
-                before_values.append(STARTING_WS_MATCH(arg_value)[0])
-                after_values.append(ENDING_WS_MATCH(arg_value)[0])
-            pre_name_ws_mode = mode(before_names)
-            name_length_mode = mode(name_lengths)
-            post_value_ws_mode = mode(
-                [SPACE_AFTER_SEARCH(self.string)[0]] + after_values[1:]
-            )
-            pre_value_ws_mode = mode(before_values)
+            (
+                pre_name_ws_mode,
+                name_length_mode,
+                pre_value_ws_mode,
+                post_value_ws_mode,
+                last_post_value_ws,
+            ) = self._spacing_modes(args)
         else:
             preserve_spacing = False
         # Calculate the string that needs to be added to the Template.
@@ -247,10 +210,10 @@ class Template(SubWikiTextWithArgs):
                 addstring = '|' + name + '=' + value
         # Place the addstring in the right position.
         if before:
-            arg = get_arg(before, args)
+            arg = self.get_arg(before)
             arg.insert(0, addstring)
         elif after:
-            arg = get_arg(after, args)
+            arg = self.get_arg(after)
             arg.insert(len(arg.string), addstring)
         else:
             if args and not positional:
@@ -265,7 +228,7 @@ class Template(SubWikiTextWithArgs):
                         arg.string.rstrip(WS)
                         + post_value_ws_mode
                         + addstring.rstrip(WS)
-                        + after_values[0]
+                        + last_post_value_ws
                     )
                 else:
                     arg.insert(len(arg_string), addstring)
@@ -274,12 +237,216 @@ class Template(SubWikiTextWithArgs):
                 # positional AND is to be added at the end of the template.
                 self.insert(-2, addstring)
 
+    def set_args(
+        self,
+        mapping: Mapping[str, str],
+        preserve_spacing=False,
+        order: Iterable[str] | None = None,
+    ) -> None:
+        """Set the values of many arguments in a single edit.
+
+        Existing arguments are updated in place. New arguments are appended
+        to the end of the template in the order of `order` if it is given,
+        followed by the remaining names of `mapping`.
+
+        The result is the same as calling `set_arg(name, value)` for each
+        of these names in turn, but the arguments are only looked up once
+        and all the changes are applied to the string and the spans at once.
+        With `preserve_spacing`, the spacing of the new arguments is the most
+        common one of the existing arguments, while consecutive `set_arg`
+        calls also count the arguments that they have added.
+
+        A positional argument whose new value contains '=' may become a
+        keyword argument, and a new positional argument may be found by the
+        later names. In these cases the names are set one by one by
+        `set_arg`.
+
+        Example:
+            >>> t = Template('{{t|a=1|b=2}}')
+            >>> t.set_args({'b': '3', 'c': '4'})
+            >>> t.string
+            '{{t|a=1|b=3|c=4}}'
+        """
+        if order is None:
+            names: Iterable[str] = mapping
+        else:
+            order = [*order]
+            ordered = {*order}
+            names = order + [name for name in mapping if name not in ordered]
+        named_args, index = self._arg_index()
+        string = self.string
+        ss = self._span_data[0]
+        updates: dict[int, list] = {}
+        additions: dict[str, tuple[str, str]] = {}
+        one_by_one = False
+        for name in names:
+            if one_by_one:
+                break
+            value = mapping[name]
+            key = name.strip(WS)
+            args = index.get(key)
+            if args:
+                arg = args[-1]
+                s, e, _, _ = arg._span_data
+                shadow_match = arg._shadow_match
+                if shadow_match['eq']:
+                    value_start = s - ss + shadow_match.start('post_eq')
+                elif '=' in value:
+                    # The later positional arguments may be renumbered.
+                    one_by_one = True
+                    break
+                else:
+                    value_start = s - ss + 1
+                if preserve_spacing:
+                    val = string[value_start : e - ss]
+                    value = val.replace(val.strip(WS), value, 1)
+                updates[value_start] = [value_start, e - ss, value]
+            elif key in additions:
+                additions[key] = additions[key][0], value
+            else:
+                additions[key] = name, value
+                # The later names may refer to a new positional argument.
+                one_by_one = not name
+        else:
+            one_by_one = False
+        if one_by_one:
+            for name in names:
+                self.set_arg(
+                    name, mapping[name], preserve_spacing=preserve_spacing
+                )
+            return
+        edits = sorted(updates.values())
+        if additions:
+            if preserve_spacing and named_args:
+                (
+                    pre_name_ws_mode,
+                    name_length_mode,
+                    pre_value_ws_mode,
+                    post_value_ws_mode,
+                    last_post_value_ws,
+                ) = self._spacing_modes(
+                    [arg for _, arg in reversed(named_args)]
+                )
+                # Like set_arg, keep the whitespace before the final braces.
+                tail = (
+                    ''.join(
+                        post_value_ws_mode
+                        + (
+                            '|'
+                            + (pre_name_ws_mode + key).ljust(name_length_mode)
+                            + '='
+                            + pre_value_ws_mode
+                            + value
+                            if name
+                            else '|' + value
+                        ).rstrip(WS)
+                        for key, (name, value) in additions.items()
+                    )
+                    + last_post_value_ws
+                )
+                last_end = len(string) - 2
+                if edits and edits[-1][1] == last_end:
+                    # The value of the last argument is updated, too.
+                    edit = edits.pop()
+                    start = edit[0]
+                    tail = edit[2].rstrip(WS) + tail
+                else:
+                    last_start = named_args[-1][1]._span_data[0] - ss
+                    start = last_start + len(
+                        string[last_start:last_end].rstrip(WS)
+                    )
+            else:
+                start = len(string) - 2
+                tail = ''.join(
+                    '|' + name + '=' + value if name else '|' + value
+                    for name, value in additions.values()
+                )
+            # Also replace the closing braces so that the last argument and
+            # the nodes that end with it do not grow.
+            edits.append([start, len(string), tail + '}}'])
+        self._replace_ranges(edits)
+
+    def _spacing_modes(
+        self, args: list[Argument]
+    ) -> tuple[str, int, str, str, str]:
+        """Return the most common spacing of the given arguments.
+
+        `args` should be in reversed order. Return (whitespace before names,
+        length of names, whitespace before values, whitespace after values,
+        whitespace after the value of the last argument).
+        """
+        before_names = []
+        name_lengths = []
+        before_values = []
+        after_values = []
+        for arg in args:
+            aname = arg.name
+            name_len = len(aname)
+            name_lengths.append(name_len)
+            before_names.append(STARTING_WS_MATCH(aname)[0])
+            arg_value = arg.value
+            before_values.append(STARTING_WS_MATCH(arg_value)[0])
+            after_values.append(ENDING_WS_MATCH(arg_value)[0])
+        return (
+            mode(before_names),
+            mode(name_lengths),
+            mode(before_values),
+            mode([SPACE_AFTER_SEARCH(self.string)[0]] + after_values[1:]),
+            after_values[0],
+        )
+
     def get_arg(self, name: str) -> Argument | None:
         """Return the last argument with the given name.
 
         Return None if no argument with that name is found.
         """
-        return get_arg(name, reversed(self.arguments))
+        args = self._arg_index()[1].get(name.strip(WS))
+        return args[-1] if args else None
+
+    def as_dict(self, strip=True, last_wins=True) -> dict[str, str]:
+        """Return a {name: value} dict of the arguments.
+
+        This is equivalent to reading `name` and `value` of each item of
+        `self.arguments`, but works directly on the argument spans and does
+        not create any Argument objects.
+
+        :param strip: strip whitespace from names and from the values of
+            keyword arguments, like MediaWiki does. Values of positional
+            arguments are never stripped.
+        :param last_wins: for duplicate names keep the value of the last
+            argument, like MediaWiki does. If False, keep the first one.
+
+        Example:
+            >>> Template('{{t| a = 1 | b |a=2}}').as_dict()
+            {'a': '2', '1': ' b '}
+        """
+        shadow = self._shadow
+        find = shadow.find
+        string = self.string
+        result: dict[str, str] = {}
+        position = 1
+        for s, e in self._name_args_matcher(shadow, 2, -2).spans('arg'):
+            eq = find(b'=', s, e)
+            if eq != -1 and find(b'\n', s, eq) != -1:
+                # The '=' may belong to a section heading in the name.
+                m = ARG_SHADOW_FULLMATCH(shadow, s, e)
+                eq = m.start('eq') if m['eq'] else None
+            if eq is None or eq == -1:
+                name = str(position)
+                value = string[s + 1 : e]
+            else:
+                name = string[s + 1 : eq]
+                value = string[eq + 1 : e]
+                if strip:
+                    name = name.strip(WS)
+                    value = value.strip(WS)
+            if eq == -1:
+                position += 1
+            if last_wins:
+                result[name] = value
+            else:
+                result.setdefault(name, value)
+        return result
 
     def has_arg(self, name: str, value: str | None = None) -> bool:
         """Return true if the is an arg named `name`.
@@ -290,29 +457,70 @@ class Template(SubWikiTextWithArgs):
             better to get_arg directly and then check if the returned value
             is None.
         """
-        for arg in reversed(self.arguments):
-            if arg.name.strip(WS) == name.strip(WS):
-                if value:
-                    if arg.positional:
-                        if arg.value == value:
-                            return True
-                        return False
-                    if arg.value.strip(WS) == value.strip(WS):
-                        return True
-                    return False
-                return True
-        return False
+        arg = self.get_arg(name)
+        if arg is None:
+            return False
+        if value:
+            if arg.positional:
+                return arg.value == value
+            return arg.value.strip(WS) == value.strip(WS)
+        return True
 
     def del_arg(self, name: str) -> None:
         """Delete all arguments with the given then."""
-        for arg in reversed(self.arguments):
-            if arg.name.strip(WS) == name.strip(WS):
-                del arg[:]
+        for arg in reversed(self._arg_index()[1].get(name.strip(WS), ())):
+            del arg[:]
 
     @property
     def templates(self) -> list[Template]:
         return super().templates[1:]
 
+    def iter_templates(self) -> Iterator[Template]:
+        return islice(super().iter_templates(), 1, None)
+
+
+@lru_cache(maxsize=4096)
+def _normal_name(
+    name: str,
+    rm_namespaces: tuple[str, ...],
+    code: str | None,
+    capitalize: bool,
+) -> str:
+    """Return the normal form of a template name. See `normal_name`.
+
+    The result is cached, because the same few names are normalized over and
+    over again when processing many templates.
+    """
+    # Remove comments
+    name = COMMENT_SUB('', name).strip(WS)
+    # Remove code
+    if code:
+        head, sep, tail = name.partition(':')
+        if not head and sep:
+            name = tail.strip(' ')
+            head, sep, tail = name.partition(':')
+        if code.lower() == head.strip(' ').lower():
+            name = tail.strip(' ')
+    # Remove namespace
+    head, sep, tail = name.partition(':')
+    if not head and sep:
+        name = tail.strip(' ')
+        head, sep, tail = name.partition(':')
+    if head:
+        ns = head.strip(' ').lower()
+        for namespace in rm_namespaces:
+            if namespace.lower() == ns:
+                name = tail.strip(' ')
+                break
+    # Use space instead of underscore
+    name = name.replace('_', ' ')
+    if capitalize:
+        # Use uppercase for the first letter
+        name = name[:1].upper() + name[1:]
+    # Remove #anchor
+    name, sep, tail = name.partition('#')
+    return ' '.join(name.split())
+
 
 def mode(list_: list[T]) -> T:
     """Return the most common item in the list.
@@ -331,17 +539,3 @@ def mode(list_: list[T]) -> T:
     """
     return max(set(list_), key=list_.count)
 
-
-def get_arg(name: str, args: Iterable[Argument]) -> Argument | None:
-    """Return the first argument in the args that has the given name.
-
-    Return None if no such argument is found.
-
-    As the computation of self.arguments is a little costly, this
-    function was created so that other methods that have already computed
-    the arguments use it instead of calling self.get_arg directly.
-    """
-    for arg in args:
-        if arg.name.strip(WS) == name.strip(WS):
-            return arg
-    return None
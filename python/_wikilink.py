@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+from itertools import islice
+from typing import Iterator
+
 from regex import DOTALL, Match
 
 from ._wikitext import SubWikiText, rc
@@ -145,3 +148,6 @@ class WikiLink(SubWikiText):
     @property
     def wikilinks(self) -> list[WikiLink]:
         return super().wikilinks[1:]
+
+    def iter_wikilinks(self) -> Iterator[WikiLink]:
+        return islice(super().iter_wikilinks(), 1, None)
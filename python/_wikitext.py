@@ -1,19 +1,15 @@
 from __future__ import annotations
 
 from bisect import bisect_left, bisect_right
-from itertools import islice
 from typing import (
     Iterable,
+    Iterator,
     MutableSequence,
 )
 from ._spans import (
     TypeToSpans,
 )
 
-from ._wikitext_utils import (
-    SPAN_PARSER_TYPES,
-)
-
 from ._wikitextmain import WikiText
 
 
@@ -63,6 +59,17 @@ class SubWikiText(WikiText):
             if span[1] <= se
         ]
 
+    def _iter_subspans(self, type_: str) -> Iterator[list]:
+        """Lazily yield the same spans as `self._subspans(type_)`."""
+        ss, se, _, _ = self._span_data
+        spans = self._type_to_spans[type_]
+        for i in range(bisect_left(spans, [ss]), len(spans)):
+            span = spans[i]
+            if span[0] >= se:
+                return
+            if span[1] <= se:
+                yield span
+
     def ancestors(self, type_: str | None = None) -> list[WikiText]:
         """Return the ancestors of the current node.
 
@@ -71,22 +78,18 @@ class SubWikiText(WikiText):
             ParserFunction, WikiLink, Comment, Parameter, ExtensionTag}.
             The default is None and means all the ancestors of any type above.
         """
-        if type_ is None:
-            types = SPAN_PARSER_TYPES
-        else:
-            types = (type_,)
-        lststr = self._lststr
-        type_to_spans = self._type_to_spans
-        ss, se, _, _ = self._span_data
+        parents = self._tree[0]
+        node = self._node
+        classes = SPAN_PARSER_CLASSES
         ancestors = []
         ancestors_append = ancestors.append
-        for type_ in types:
-            cls = globals()[type_]
-            spans = type_to_spans[type_]
-            for span in spans[: bisect_right(spans, [ss])]:
-                if se < span[1]:
-                    ancestors_append(cls(lststr, type_to_spans, span, type_))
-        return sorted(ancestors, key=lambda i: ss - i._span_data[0])
+        parent = self._tree_container()
+        while parent is not None:
+            ptype, pspan = parent
+            if type_ is None or ptype == type_:
+                ancestors_append(node(classes[ptype], pspan, ptype))
+            parent = parents[id(pspan)]
+        return ancestors
 
     def parent(self, type_: str | None = None) -> WikiText | None:
         """Return the parent node of the current object.
@@ -98,24 +101,35 @@ class SubWikiText(WikiText):
         :return: parent WikiText object or None if no parent with the desired
             `type_` is found.
         """
-        ancestors = self.ancestors(type_)
-        if ancestors:
-            return ancestors[0]
+        parents = self._tree[0]
+        parent = self._tree_container()
+        while parent is not None:
+            ptype, pspan = parent
+            if type_ is None or ptype == type_:
+                return self._node(SPAN_PARSER_CLASSES[ptype], pspan, ptype)
+            parent = parents[id(pspan)]
         return None
 
 
 def _outer_spans(sorted_spans: list[list[int]]) -> Iterable[list[int]]:
     """Yield the outermost intervals."""
-    for i, span in enumerate(sorted_spans):
+    max_end = -1
+    for span in sorted_spans:
         se = span[1]
-        for ps, pe, _, _ in islice(sorted_spans, None, i):
-            if se < pe:
-                break
-        else:  # none of the previous spans included span
+        if max_end <= se:  # none of the previous spans included span
             yield span
+            max_end = se
 
 
 def remove_markup(s: str, **kwargs) -> str:
     # plain_text_doc will be added to __doc__
     """Return a string with wiki markup removed/replaced."""
     return WikiText(s).plain_text(**kwargs, _is_root_node=True)
+
+
+def iter_remove_markup(s: str, **kwargs) -> Iterator[str]:
+    """Yield the result of `remove_markup` in chunks.
+
+    See `WikiText.iter_plain_text` for the keyword arguments.
+    """
+    return WikiText(s).iter_plain_text(**kwargs, _is_root_node=True)
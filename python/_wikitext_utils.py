@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+from bisect import bisect_left, bisect_right
+from html import unescape
+from typing import Iterator
 
 from regex import (
     DOTALL,
@@ -45,6 +48,13 @@ INVALID_EL_TPP_CHRS_SUB = rc(  # the [:-4] slice allows \[ and \]
     rb'[' + INVALID_URL_CHARS[:-4] + rb'{}|]'
 ).sub
 
+# The same character references that html.unescape replaces
+CHARREF_FINDITER = rc(
+    r'&(?:#[0-9]+;?|#[xX][0-9a-fA-F]+;?|[^\t\n\f <&#;]{1,32};?)'
+).finditer
+# Text that a character reference may still continue after
+CHARREF_PREFIX_FULLMATCH = rc(r'&[^\t\n\f <&;]*').fullmatch
+
 # Sections
 SECTION_HEADING = rb'^(?<equals>={1,6})[^\n]+?(?P=equals)[ \t]*+$'
 SUB_SECTION = rb'(?:^(?P=equals)=[^\n]+?(?P=equals)=[ \t]*+$.*?)*'
@@ -85,6 +95,31 @@ TABLE_FINDITER = rc(
     DOTALL | MULTILINE | VERBOSE,
 ).finditer
 
+# Tokens for `_table_spans`, which pairs table-starts and table-ends the same
+# way that repeatedly applying TABLE_FINDITER and masking the found tables
+# would.
+TABLE_TOKEN_FINDITER = rc(
+    rb"""
+    # Table-start, the indent tells if it would stop the contents of the
+    # previous table-starts from reaching over its line.
+    (?<=^(?<indent>[ :\0]*+))
+    {\|
+    (?:
+        # A table that TABLE_FINDITER finds in its first round
+        (?<contents>
+            (?:(?!^\ *+\{\|).)*?
+            \n\s*+
+            (?> \|} | \Z )
+        )
+        # or just the table-start
+        |
+    )
+    # Table-end
+    | \n\s*+(?> \|} | \Z )
+    """,
+    DOTALL | MULTILINE | VERBOSE,
+).finditer
+
 substitute_apostrophes = rc(rb"('\0*+){2,}+(?=[^']|$)", MULTILINE).sub
 
 BOLD_FINDITER = rc(
@@ -153,6 +188,331 @@ DEAD_INDEX = DeadIndex()  # == int() == 0
 DEAD_SPAN = DEAD_INDEX, DEAD_INDEX, None, None
 
 
+def _spans_in(spans: list[list], b: int, e: int) -> list[list]:
+    """Return the spans of the sorted list that start in [b, e)."""
+    return spans[bisect_left(spans, [b]) : bisect_right(spans, [e])]
+
+
+def _merge_intervals(
+    intervals: list[tuple[int, int]],
+) -> tuple[list[int], list[int]]:
+    """Sort and merge the given (start, stop) intervals.
+
+    Return the starts and the stops of the merged intervals as two lists.
+    """
+    starts: list[int] = []
+    stops: list[int] = []
+    for s, e in sorted(intervals):
+        if stops and s <= stops[-1]:
+            if e > stops[-1]:
+                stops[-1] = e
+            continue
+        starts.append(s)
+        stops.append(e)
+    return starts, stops
+
+
+def _table_spans(shadow: bytearray, pos: int) -> list[tuple[int, int]]:
+    """Return the (start, stop) of all the tables in shadow.
+
+    The result is the same as finding the innermost tables with
+    TABLE_FINDITER, masking them, and repeating until nothing is found, but
+    it is computed in one pass with a stack of the open table-starts.
+
+    A table-end closes the start that those rounds would pair it with. The
+    candidates are the last open start that is indented with spaces only and
+    the starts after it; earlier starts are blocked by it. Of those, the ones
+    with the fewest rounds of inner tables to mask come first, then the
+    leftmost. The starts after the chosen one are swallowed by its table.
+    """
+    spans = []
+    spans_append = spans.append
+    # The open table-starts and, for each one, the last round in which a
+    # table after it was found.
+    starts: list[int] = []
+    rounds: list[int] = []
+    # Indices of the open table-starts that are indented with spaces only
+    blocking: list[int] = []
+    for m in TABLE_TOKEN_FINDITER(shadow, pos):
+        group = m.lastgroup
+        if group == 'contents':  # a table found in the first round
+            spans_append(m.span())
+            if rounds and rounds[-1] < 1:
+                rounds[-1] = 1
+            continue
+        if group is not None:  # table-start
+            if not m['indent'].strip(b' '):
+                blocking.append(len(starts))
+            starts.append(m.start())
+            rounds.append(0)
+            continue
+        if not starts:  # stray table-end
+            continue
+        low = blocking[-1] if blocking else 0
+        i = len(starts) - 1
+        inner_round = rounds[i]
+        while i > low and rounds[i - 1] <= inner_round:
+            i -= 1
+        spans_append((starts[i], m.end()))
+        del starts[i:], rounds[i:]
+        if blocking and blocking[-1] >= i:
+            blocking.pop()
+        if rounds and rounds[-1] <= inner_round:
+            rounds[-1] = inner_round + 1
+    return spans
+
+
+def _is_removed(starts: list[int], stops: list[int], i: int) -> bool:
+    """Return True if index i falls in one of the merged intervals."""
+    j = bisect_right(starts, i) - 1
+    return j >= 0 and i < stops[j]
+
+
+def _marks_in(
+    marks: list[tuple[int, int, int, int]], b: int, e: int
+) -> Iterator[tuple[int, int]]:
+    """Yield the intervals of the marks whose owner is inside [b, e].
+
+    Each mark is an (owner_start, owner_end, start, stop) tuple and marks
+    are sorted.
+    """
+    for i in range(bisect_left(marks, (b,)), len(marks)):
+        ob, oe, s, e_ = marks[i]
+        if ob >= e:
+            return
+        if oe <= e:
+            yield s, e_
+
+
+def _nodes_in(
+    nodes: list, node_starts: list[int], b: int, e: int
+) -> Iterator:
+    """Yield the nodes that are inside [b, e].
+
+    `node_starts` is the sorted list of the start of the nodes.
+    """
+    for i in range(bisect_left(node_starts, b), len(nodes)):
+        if node_starts[i] >= e:
+            return
+        node = nodes[i]
+        if node._span_data[1] <= e:
+            yield node
+
+
+def _kept_spans(
+    starts: list[int], stops: list[int], b: int, e: int
+) -> Iterator[tuple[int, int]]:
+    """Yield the (start, stop) parts of [b, e) not covered by the intervals."""
+    i = bisect_right(starts, b) - 1
+    if i >= 0 and stops[i] > b:
+        b = stops[i]
+    i += 1
+    n = len(starts)
+    while b < e:
+        if i == n or starts[i] >= e:
+            yield b, e
+            return
+        s = starts[i]
+        if b < s:
+            yield b, s
+        b = stops[i]
+        i += 1
+
+
+def _kept_text(
+    string: str,
+    starts: list[int],
+    stops: list[int],
+    replacements: dict[int, str],
+    positions: list[int],
+    b: int,
+    e: int,
+) -> str:
+    """Return string[b:e] without the removed intervals.
+
+    Each character whose index is a key in `replacements` is replaced by
+    the corresponding value. `positions` is the sorted list of those keys.
+    """
+    pieces = []
+    append = pieces.append
+    for ks, ke in _kept_spans(starts, stops, b, e):
+        for p in positions[
+            bisect_left(positions, ks) : bisect_left(positions, ke)
+        ]:
+            append(string[ks:p])
+            append(replacements[p])
+            ks = p + 1
+        append(string[ks:ke])
+    return ''.join(pieces)
+
+
+class OffsetMap:
+    """Map offsets between a plain text and the wikitext it was made from.
+
+    The map is stored as runs. Run ``i`` starts at ``plain[i]`` in the plain
+    text and ends where the next run starts (or at `length`). In the source
+    it covers ``source[i]`` to ``source_end[i]``. Runs of kept text map
+    character by character (``linear[i]`` is True); the other runs, e.g. a
+    replaced template or an unescaped HTML entity, map as a whole.
+
+    Source offsets are relative to the string that `plain_text` was called
+    on. All lookups are O(log n) in the number of runs.
+    """
+
+    __slots__ = 'plain', 'source', 'source_end', 'linear', 'length'
+
+    def __init__(self) -> None:
+        self.plain: list[int] = []
+        self.source: list[int] = []
+        self.source_end: list[int] = []
+        self.linear: list[bool] = []
+        #: The length of the plain text.
+        self.length = 0
+
+    def __repr__(self):
+        return f'{type(self).__name__}(<{len(self.plain)} runs>)'
+
+    def _add(self, length: int, ss: int, se: int, linear: bool):
+        """Append a run of `length` plain characters made from [ss, se)."""
+        if not length:
+            return
+        source_end = self.source_end
+        if source_end and self.linear[-1] is linear and (
+            (linear and source_end[-1] == ss)  # contiguous kept text
+            or (not linear and self.source[-1] == ss and source_end[-1] == se)
+        ):  # extend the previous run
+            source_end[-1] = se
+        else:
+            self.plain.append(self.length)
+            self.source.append(ss)
+            source_end.append(se)
+            self.linear.append(linear)
+        self.length += length
+
+    def _plain_end(self, i: int) -> int:
+        plain = self.plain
+        return plain[i + 1] if i + 1 < len(plain) else self.length
+
+    def to_source(self, i: int) -> int:
+        """Return the source offset of the plain text character at `i`.
+
+        `i` may also be the length of the plain text, in which case the end
+        of the last run is returned.
+        """
+        if not 0 <= i <= self.length:
+            raise IndexError('plain text offset out of range')
+        if i == self.length:
+            return self.source_end[-1] if self.plain else 0
+        j = bisect_right(self.plain, i) - 1
+        if self.linear[j]:
+            return self.source[j] + i - self.plain[j]
+        return self.source[j]
+
+    def to_plain(self, i: int) -> int:
+        """Return the plain text offset of the source character at `i`.
+
+        Removed source characters are mapped to the plain text position
+        where they would have been.
+        """
+        j = bisect_right(self.source, i) - 1
+        if j < 0:
+            return 0
+        if i >= self.source_end[j]:  # removed
+            return self._plain_end(j)
+        if self.linear[j]:
+            return self.plain[j] + i - self.source[j]
+        return self.plain[j]
+
+    def source_span(self, b: int, e: int) -> tuple[int, int]:
+        """Return the source (start, end) of the plain text slice [b:e]."""
+        start = self.to_source(b)
+        if b >= e:
+            return start, start
+        if e > self.length:
+            raise IndexError('plain text offset out of range')
+        j = bisect_right(self.plain, e - 1) - 1
+        if self.linear[j]:
+            return start, self.source[j] + e - self.plain[j]
+        return start, self.source_end[j]
+
+
+def _kept_text_with_offsets(
+    string: str,
+    starts: list[int],
+    stops: list[int],
+    replacements: dict[int, str],
+    positions: list[int],
+    b: int,
+    e: int,
+) -> tuple[str, OffsetMap]:
+    """Return the result of `_kept_text` and its `OffsetMap`.
+
+    Source offsets in the map are relative to `b`.
+    """
+    pieces = []
+    append = pieces.append
+    offsets = OffsetMap()
+    add = offsets._add
+    for ks, ke in _kept_spans(starts, stops, b, e):
+        for p in positions[
+            bisect_left(positions, ks) : bisect_left(positions, ke)
+        ]:
+            append(string[ks:p])
+            add(p - ks, ks - b, p - b, True)
+            # the replaced node ends where the next kept span starts
+            ns = next(_kept_spans(starts, stops, p + 1, e), (e,))[0]
+            replacement = replacements[p]
+            append(replacement)
+            add(len(replacement), p - b, ns - b, False)
+            ks = p + 1
+        append(string[ks:ke])
+        add(ke - ks, ks - b, ke - b, True)
+    return ''.join(pieces), offsets
+
+
+def _unescape_with_offsets(
+    text: str, offsets: OffsetMap
+) -> tuple[str, OffsetMap]:
+    """Unescape HTML entities in text and update its offset map."""
+    pieces = []
+    append = pieces.append
+    result = OffsetMap()
+    add = result._add
+    plain = offsets.plain
+    source = offsets.source
+    source_end = offsets.source_end
+    linear = offsets.linear
+
+    def copy(b: int, e: int):
+        append(text[b:e])
+        j = bisect_right(plain, b) - 1
+        while j < len(plain) and plain[j] < e:
+            pb = max(b, plain[j])
+            pe = min(e, offsets._plain_end(j))
+            if linear[j]:
+                ss = source[j] + pb - plain[j]
+                add(pe - pb, ss, ss + pe - pb, True)
+            else:
+                add(pe - pb, source[j], source_end[j], False)
+            j += 1
+
+    last = 0
+    for m in CHARREF_FINDITER(text):
+        entity = m[0]
+        unescaped = unescape(entity)
+        if unescaped == entity:
+            continue
+        mb, me = m.span()
+        copy(last, mb)
+        append(unescaped)
+        add(len(unescaped), *offsets.source_span(mb, me), False)
+        last = me
+    if last == 0:
+        return text, offsets
+    copy(last, len(text))
+    return ''.join(pieces), result
+
+
 def _table_to_text(t: Table) -> str:
     data = [
         [(cell if cell is not None else '') for cell in row]
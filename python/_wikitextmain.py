@@ -3,10 +3,13 @@ from __future__ import annotations
 from bisect import insort_right
 from html import unescape
 from itertools import islice
+from math import inf
 from operator import attrgetter
 from typing import (
     Callable,
     Iterable,
+    Iterator,
+    Literal,
     overload,
 )
 from warnings import warn
@@ -17,7 +20,6 @@ from regex import (
     finditer,
     search,
 )
-from wcwidth import wcswidth
 
 # noinspection PyProtectedMember
 from ._config import (
@@ -31,23 +33,33 @@ from ._spans import (
     parse_to_spans,
 )
 
+from ._pformat import pformat as _pformat
 from ._wikitext_utils import (
+    CHARREF_PREFIX_FULLMATCH,
     NAME_CAPTURING_HTML_START_TAG_FINDITER,
     EXTERNAL_LINK_FINDITER,
     INVALID_EL_TPP_CHRS_SUB,
     SECTIONS_FULLMATCH,
     SECTIONS_TOP_LEVELS_ONLY,
-    TABLE_FINDITER,
     substitute_apostrophes,
     BOLD_FINDITER,
     ITALIC_FINDITER,
     SPAN_PARSER_TYPES,
-    WS,
-    _table_to_text
+    OffsetMap,
+    _is_removed,
+    _kept_text,
+    _kept_text_with_offsets,
+    _marks_in,
+    _merge_intervals,
+    _nodes_in,
+    _spans_in,
+    _table_spans,
+    _table_to_text,
+    _unescape_with_offsets,
 )
 
 
-from .wikitext_base import WikiTextBase  # Assuming wikitext_base.py is in the same package/directory.
+from .wikitext_base import LstStr, SubtreeSpans, WikiTextBase, _memoized  # Assuming wikitext_base.py is in the same package/directory.
 
 
 class WikiText(WikiTextBase):
@@ -58,6 +70,16 @@ class WikiText(WikiTextBase):
 
     # __slots__ are inherited implicitly, no need to redefine unless adding new ones.
 
+    @overload
+    def plain_text(
+        self, *, with_offsets: Literal[False] = False, **kwargs
+    ) -> str: ...
+
+    @overload
+    def plain_text(
+        self, *, with_offsets: Literal[True], **kwargs
+    ) -> tuple[str, OffsetMap]: ...
+
     def plain_text(
         self,
         *,
@@ -71,368 +93,486 @@ class WikiText(WikiTextBase):
         unescape_html_entities=True,
         replace_bolds_and_italics=True,
         replace_tables: Callable[[Table], str | None] | bool = _table_to_text,
+        with_offsets=False,
         _is_root_node=False,
-    ) -> str:
+    ) -> str | tuple[str, OffsetMap]:
         # plain_text_doc will be added to __doc__
-        """Return a plain text string representation of self."""
-        if _is_root_node is False:
-            s, e, m, b = self._span_data
-            tts = self._inner_type_to_spans_copy()
-            # Note: Here WikiText is initialized, ensuring it refers to the same underlying _lststr and _type_to_spans
-            # and that it's a "WikiText" instance for its methods.
-            parsed = WikiText([self._lststr[0][s:e]], tts)
-            new_end = e - s
-            for span_data in tts[self._type]:  # Self._type will be 'WikiText'
-                if span_data[1] == new_end:
-                    parsed._span_data = span_data
-                    break
-            else:  # self is a dead span
-                parsed._span_data = [0, 0, None, bytearray()]
+        """Return a plain text string representation of self.
+
+        If `with_offsets` is True, return a ``(text, offset_map)`` tuple
+        instead. The `OffsetMap` translates offsets between the returned
+        text and ``self.string`` in both directions.
+        """
+        parsed = self if _is_root_node else self._subtree_view()
+        string = parsed._lststr[0]
+        b, e = parsed._span_data[:2]
+        # The markup of nodes crossing the end of self is applied, too.
+        ((_, _, starts, stops, replacements),) = parsed._plain_text_intervals(
+            ((b, inf),),
+            replace_templates,
+            replace_parser_functions,
+            replace_parameters,
+            replace_tags,
+            replace_external_links,
+            replace_wikilinks,
+            replace_bolds_and_italics,
+            replace_tables,
+        )
+        if with_offsets:
+            string, offsets = _kept_text_with_offsets(
+                string, starts, stops, replacements, sorted(replacements), b, e
+            )
+            if unescape_html_entities:
+                return _unescape_with_offsets(string, offsets)
+            return string, offsets
+        string = _kept_text(
+            string, starts, stops, replacements, sorted(replacements), b, e
+        )
+        if unescape_html_entities:
+            string = unescape(string)
+        return string
+
+    def _subtree_view(self) -> WikiText:
+        """Return a WikiText root of self.string that shares its parsing.
+
+        Unlike `parse(self.string)`, the spans of the view are copied from
+        the document with their cached shadows; see `SubtreeSpans`. Like
+        it, offsets are relative to the start of self and mutating the view
+        does not affect the document.
+        """
+        s, e, _, shadow = self._span_data
+        type_to_spans = SubtreeSpans(self._type_to_spans, s, e)
+        span = [0, e - s, None, shadow]
+        type_to_spans['WikiText'] = [span]
+        view = WikiText(LstStr((self._lststr[0][s:e],)), type_to_spans)
+        view._span_data = span
+        return view
+
+    def iter_plain_text(
+        self,
+        *,
+        chunk_size: int | None = 65536,
+        replace_templates: bool | Callable[[Template], str | None] = True,
+        replace_parser_functions: bool
+        | Callable[[ParserFunction], str | None] = True,
+        replace_parameters=True,
+        replace_tags=True,
+        replace_external_links=True,
+        replace_wikilinks=True,
+        unescape_html_entities=True,
+        replace_bolds_and_italics=True,
+        replace_tables: Callable[[Table], str | None] | bool = _table_to_text,
+        _is_root_node=False,
+    ) -> Iterator[str]:
+        """Yield the plain text of self in chunks, in document order.
+
+        The chunks add up to ``self.plain_text()`` with the same options, but
+        the whole text is never built at once, so they can be written out
+        to a file or fed to a tokenizer with bounded memory.
+
+        :keyword chunk_size: the number of source characters that each
+            chunk is made from. If None, yield one chunk per section.
+
+        The other keyword arguments are the same as `plain_text`.
+        """
+        parsed = self if _is_root_node else self._subtree_view()
+        string = parsed._lststr[0]
+        b, n = parsed._span_data[:2]
+        ((_, _, starts, stops, replacements),) = parsed._plain_text_intervals(
+            ((b, inf),),
+            replace_templates,
+            replace_parser_functions,
+            replace_parameters,
+            replace_tags,
+            replace_external_links,
+            replace_wikilinks,
+            replace_bolds_and_italics,
+            replace_tables,
+        )
+        positions = sorted(replacements)
+        if chunk_size is None:
+            bounds = [
+                b + s
+                for s, _ in SECTIONS_FULLMATCH(parsed._shadow).spans('section')
+            ][1:]
         else:
-            tts = self._type_to_spans
-            parsed = self
-        lst: list[str | None] = list(parsed.string)
+            bounds = range(b + chunk_size, n, chunk_size)
+        pending = ''  # the text after a possibly incomplete HTML entity
+        for e in (*bounds, n):
+            text = pending + _kept_text(
+                string, starts, stops, replacements, positions, b, e
+            )
+            b = e
+            if not unescape_html_entities:
+                if text:
+                    yield text
+                continue
+            amp = text.rfind('&')
+            if e != n and amp != -1 and CHARREF_PREFIX_FULLMATCH(text, amp):
+                pending = text[amp:]
+                text = text[:amp]
+            else:
+                pending = ''
+            if text:
+                yield unescape(text)
+
+    def plain_texts(
+        self,
+        nodes: Iterable[WikiText],
+        *,
+        replace_templates: bool | Callable[[Template], str | None] = True,
+        replace_parser_functions: bool
+        | Callable[[ParserFunction], str | None] = True,
+        replace_parameters=True,
+        replace_tags=True,
+        replace_external_links=True,
+        replace_wikilinks=True,
+        unescape_html_entities=True,
+        replace_bolds_and_italics=True,
+        replace_tables: Callable[[Table], str | None] | bool = _table_to_text,
+    ) -> list[str]:
+        """Return the plain text of each of the given nodes of this document.
 
-        def remove(b: int, e: int):
-            lst[b:e] = [None] * (e - b)
+        The markup of the whole document is collected once and then each
+        node's plain text is cut out of it, which is much faster than calling
+        `plain_text` on many nodes, e.g. all the cells of a large table.
 
-        for b, e, _, _ in tts['Comment']:
-            remove(b, e)
+        Each text is the node's part of the document's plain text, except
+        that only the markup lying completely inside the node is applied.
+        This usually equals ``node.plain_text()``, but may differ where
+        parsing the node on its own finds different markup, e.g. bold and
+        italics that cross the node's boundaries.
+
+        The keyword arguments are the same as `plain_text`.
+        """
+        lststr = self._lststr
+        string = lststr[0]
+        if type(self) is WikiText:
+            doc = self
+        else:  # a view of the whole document
+            doc = WikiText(lststr, self._type_to_spans)
+            doc._span_data = [0, len(string), None, None]
+        texts = []
+        append = texts.append
+        for b, e, starts, stops, replacements in doc._plain_text_intervals(
+            [node._span_data[:2] for node in nodes],
+            replace_templates,
+            replace_parser_functions,
+            replace_parameters,
+            replace_tags,
+            replace_external_links,
+            replace_wikilinks,
+            replace_bolds_and_italics,
+            replace_tables,
+        ):
+            text = _kept_text(
+                string, starts, stops, replacements, sorted(replacements), b, e
+            )
+            append(unescape(text) if unescape_html_entities else text)
+        return texts
+
+    def _plain_text_intervals(
+        self,
+        ranges: Iterable[tuple[int, int] | list[int]],
+        replace_templates,
+        replace_parser_functions,
+        replace_parameters,
+        replace_tags,
+        replace_external_links,
+        replace_wikilinks,
+        replace_bolds_and_italics,
+        replace_tables,
+    ) -> Iterator[tuple[int, int, list[int], list[int], dict[int, str]]]:
+        """Yield the removed intervals of each (start, end) range in ranges.
+
+        The markup of self is collected once as (owner_start, owner_end,
+        start, stop) marks. Each range only uses the marks whose owner node
+        lies completely inside it. Yield ``(start, end, starts, stops,
+        replacements)`` tuples; see `_merge_intervals` and `_kept_text`.
+        """
+        tts = self._type_to_spans
+        string = self._lststr[0]
+        comments = [(b, e, b, e) for b, e, _, _ in tts['Comment']]
+        # Removals that do not depend on the callable replacements. They are
+        # all done after the parser functions and before the tables.
+        marks: list[tuple[int, int, int, int]] = []
+
+        def mark(ob: int, oe: int, b: int, e: int):
+            if b < e:
+                marks.append((ob, oe, b, e))
 
         if callable(replace_templates):
-            for template in parsed.templates:
-                b, e = template._span_data[:2]  # noqa
-                if lst[b] is None:  # overwritten
-                    continue
-                lst[b] = replace_templates(template)
-                remove(b + 1, e)
+            templates = self.templates
+            template_starts = [t._span_data[0] for t in templates]
         elif replace_templates:
-            for b, e, _, _ in tts['Template']:
-                remove(b, e)
-
+            template_marks = [(b, e, b, e) for b, e, _, _ in tts['Template']]
         if callable(replace_parser_functions):
-            for pf in parsed.parser_functions:
-                b, e = pf._span_data[:2]
-                if lst[b] is None:  # already overwritten
-                    continue
-                lst[b] = replace_parser_functions(pf)
-                remove(b + 1, e)
+            parser_functions = self.parser_functions
+            pf_starts = [pf._span_data[0] for pf in parser_functions]
         elif replace_parser_functions:
-            for b, e, _, _ in tts['ParserFunction']:
-                remove(b, e)
+            pf_marks = [(b, e, b, e) for b, e, _, _ in tts['ParserFunction']]
 
         if replace_external_links:
-            for el in parsed.external_links:
+            for el in self.external_links:
                 if el.in_brackets:
                     b, e = el.span
                     text = el.text
                     if text is None:
-                        remove(b, e)
+                        mark(b, e, b, e)
                     else:
-                        remove(b, e - 1 - len(text))
-                        remove(e - 1, e)
+                        mark(b, e, b, e - 1 - len(text))
+                        mark(b, e, e - 1, e)
         # replacing bold and italics should be done before wikilinks and tags
         # because removing tags and wikilinks creates invalid spans, and
         # get_bolds() will try to look into wikilinks for bold parts.
         if replace_bolds_and_italics:
-            for i in parsed.get_bolds_and_italics():
+            for i in self.get_bolds_and_italics():
                 b, e = i.span
                 ib, ie = i._match.span(1)  # noqa, text span
-                remove(b, b + ib)
-                remove(b + ie, e)
+                mark(b, e, b, b + ib)
+                mark(b, e, b + ie, e)
         if replace_parameters:
-            for p in parsed.parameters:
+            for p in self.parameters:
                 b, e = p.span
                 default_start = p._shadow.find(124)
                 if default_start != -1:
-                    remove(b, b + default_start + 1)
-                    remove(e - 3, e)
+                    mark(b, e, b, b + default_start + 1)
+                    mark(b, e, e - 3, e)
                 else:
-                    remove(b, e)
+                    mark(b, e, b, e)
         if replace_tags:
-            for t in parsed.get_tags():
+            for t in self.get_tags():
                 b, e = t.span
                 cb, ce = t._match.span('contents')  # noqa
                 if cb != -1:  # not a self-closing tag
-                    remove(b, b + cb)
-                    remove(b + ce, e)
+                    mark(b, e, b, b + cb)
+                    mark(b, e, b + ce, e)
                 else:  # remove the whole self-closing tag
-                    remove(b, e)
+                    mark(b, e, b, e)
         if replace_wikilinks:
-            for w in parsed.wikilinks:
+            for w in self.wikilinks:
                 b, e = w.span
                 title = w.title
                 if title[:1] != ':' and (
                     title.partition(':')[2].rpartition('.')[2]
                     in KNOWN_FILE_EXTENSIONS
                 ):
-                    remove(b, e)  # image
+                    mark(b, e, b, e)  # image
                 else:
                     tb, te = w._match.span(4)  # noqa, text span
                     if tb != -1:
-                        remove(b, b + tb)
-                        remove(b + te, e)
+                        mark(b, e, b, b + tb)
+                        mark(b, e, b + te, e)
                     else:
                         tb, te = w._match.span(1)  # noqa, target span
-                        remove(b, b + tb)
-                        remove(b + te, e)
-
+                        mark(b, e, b, b + tb)
+                        mark(b, e, b + te, e)
+        marks.sort()
         if callable(replace_tables):
-            for table in parsed.get_tables():
-                b, e = table._span_data[:2]  # noqa
-                if lst[b] is None:  # overwritten
-                    continue
-                lst[b] = replace_tables(
-                    Table(''.join([c for c in lst[b:e] if c is not None]))
-                )
-                remove(b + 1, e)
+            # nested tables are skipped below if their parent is replaced
+            tables = self.get_tables(True)
+            table_starts = [t._span_data[0] for t in tables]
+
+        # callable results are computed once per node
+        results: dict[int, str | None] = {}
+
+        def result_of(node, replacer):
+            key = id(node._span_data)
+            try:
+                return results[key]
+            except KeyError:
+                result = results[key] = replacer(node)
+                return result
+
+        for rb, re in ranges:
+            removed = [*_marks_in(comments, rb, re)]
+            replacements: dict[int, str] = {}
+
+            def replace(b: int, e: int, replacement: str | None):
+                if replacement is None:
+                    if b < e:
+                        removed.append((b, e))
+                    return
+                replacements[b] = replacement
+                if b + 1 < e:
+                    removed.append((b + 1, e))
+
+            if callable(replace_templates):
+                starts, stops = _merge_intervals(removed)
+                end = 0  # the end of the last replaced template
+                for template in _nodes_in(templates, template_starts, rb, re):
+                    b, e = template._span_data[:2]  # noqa
+                    if b < end or _is_removed(starts, stops, b):  # overwritten
+                        continue
+                    end = e
+                    replace(b, e, result_of(template, replace_templates))
+            elif replace_templates:
+                removed += _marks_in(template_marks, rb, re)
+
+            if callable(replace_parser_functions):
+                starts, stops = _merge_intervals(removed)
+                end = 0
+                for pf in _nodes_in(parser_functions, pf_starts, rb, re):
+                    b, e = pf._span_data[:2]
+                    if b < end or _is_removed(starts, stops, b):
+                        continue  # already overwritten
+                    end = e
+                    replace(b, e, result_of(pf, replace_parser_functions))
+            elif replace_parser_functions:
+                removed += _marks_in(pf_marks, rb, re)
+
+            removed += _marks_in(marks, rb, re)
+
+            if callable(replace_tables):
+                starts, stops = _merge_intervals(removed)
+                positions = sorted(replacements)
+                end = 0
+                for table in _nodes_in(tables, table_starts, rb, re):
+                    b, e = table._span_data[:2]  # noqa
+                    if b < end or _is_removed(starts, stops, b):  # overwritten
+                        continue
+                    end = e
+                    replace(
+                        b,
+                        e,
+                        replace_tables(
+                            Table(
+                                _kept_text(
+                                    string,
+                                    starts,
+                                    stops,
+                                    replacements,
+                                    positions,
+                                    b,
+                                    e,
+                                )
+                            )
+                        ),
+                    )
+
+            yield (rb, re, *_merge_intervals(removed), replacements)
 
-        string = ''.join([c for c in lst if c is not None])
-        if unescape_html_entities:
-            string = unescape(string)
-        return string
 
-    def pformat(self, indent: str = '    ', remove_comments=False) -> str:
+    def pformat(
+        self,
+        indent: str = '    ',
+        remove_comments=False,
+        *,
+        nodes: Iterable[WikiText] | None = None,
+    ) -> str:
         """Return a pretty-print formatted version of `self.string`.
 
         Try to organize templates and parser functions by indenting, aligning
         at the equal signs, and adding space where appropriate.
 
+        If `nodes` is given, only those nodes of this document are formatted,
+        each one as by its own `pformat`, and the rest of `self.string`,
+        including its comments, is kept as is. Apart from copying the rest of
+        the string, the cost is proportional to the size of the given nodes,
+        not of the document. Nodes that are not inside self, or that start
+        inside another given node, are skipped.
+
         Note that this function will not mutate self.
         """
-        ws = WS
-        # Do not try to do inplace pformat. It will overwrite on some spans.
-        lststr0 = self._lststr[0]
-        s, e, m, b = self._span_data
-        # Note: Here WikiText is initialized, ensuring it refers to the same underlying _lststr and _type_to_spans
-        parsed = WikiText([lststr0[s:e]], self._inner_type_to_spans_copy())
-        # Since _type_to_spans arg of WikiText has been used, parsed._span
-        # is not set yet.
-        span = [0, e - s, m, b[:] if b is not None else None]
-        parsed._span_data = span
-        parsed._type_to_spans['WikiText'] = [span]
-        if remove_comments:
-            for c in parsed.comments:
-                del c[:]
-        else:
-            # Only remove comments that contain whitespace.
-            for c in parsed.comments:
-                if not c.contents.strip(ws):
-                    del c[:]
-        # First remove all current spacings.
-        for template in reversed(parsed.templates):
-            stripped_tl_name = template.name.strip(ws)
-            template.name = (
-                ' ' + stripped_tl_name + ' '
-                if stripped_tl_name[0] == '{'
-                else stripped_tl_name
-            )
-            args = template.arguments
-            if not args:
-                continue
-            if ':' in stripped_tl_name:
-                # Don't use False because we don't know for sure.
-                not_a_parser_function = None
-            else:
-                not_a_parser_function = True
-            # Required for alignment
-            arg_stripped_names = [a.name.strip(ws) for a in args]
-            arg_positionalities = [a.positional for a in args]
-            arg_name_lengths = [
-                wcswidth(n.replace('لا', '?')) if not p else 0
-                for n, p in zip(arg_stripped_names, arg_positionalities)
-            ]
-            max_name_len = max(arg_name_lengths)
-            # Format template.name.
-            level = template.nesting_level
-            newline_indent = '\n' + indent * level
-            template.name += newline_indent
-            if level == 1:
-                last_comment_indent = '<!--\n-->'
-            else:
-                last_comment_indent = '<!--\n' + indent * (level - 2) + ' -->'
-            # Special formatting for the last argument.
-            last_arg = args.pop()
-            last_is_positional = arg_positionalities.pop()
-            last_value = last_arg.value
-            last_stripped_value = last_value.strip(ws)
-            if last_is_positional and last_value != last_stripped_value:
-                stop_conversion = True
-                if not last_value.endswith('\n' + indent * (level - 1)):
-                    last_arg.value = last_value + last_comment_indent
-            elif not_a_parser_function:
-                stop_conversion = False
-                last_arg.name = (
-                    ' '
-                    + arg_stripped_names.pop()
-                    + ' '
-                    + ' ' * (max_name_len - arg_name_lengths.pop())
-                )
-                last_arg.value = (
-                    ' ' + last_stripped_value + '\n' + indent * (level - 1)
-                )
-            elif last_is_positional:
-                # (last_value == last_stripped_value
-                # and not_a_parser_function is not True)
-                stop_conversion = True
-                # Can't strip or adjust the position of the value
-                # because this could be a positional argument in a template.
-                last_arg.value = last_value + last_comment_indent
-            else:
-                stop_conversion = True
-                # This is either a parser function or a keyword
-                # argument in a template. In both cases the name
-                # can be lstripped and the value can be rstripped.
-                last_arg.name = ' ' + last_arg.name.lstrip(ws)
-                if not last_value.endswith('\n' + indent * (level - 1)):
-                    last_arg.value = (
-                        last_value.rstrip(ws) + ' ' + last_comment_indent
-                    )
-            if not args:
-                continue
-            comment_indent = '<!--\n' + indent * (level - 1) + ' -->'
-            for arg, stripped_name, positional, arg_name_len in zip(
-                reversed(args),
-                reversed(arg_stripped_names),
-                reversed(arg_positionalities),
-                reversed(arg_name_lengths),
+        if nodes is not None:
+            lststr0 = self._lststr[0]
+            b, se, _, _ = self._span_data
+            parts = []
+            for node in sorted(
+                nodes, key=lambda n: (n._span_data[0], -n._span_data[1])
             ):
-                value = arg.value
-                stripped_value = value.strip(ws)
-                # Positional arguments of templates are sensitive to
-                # whitespace. See:
-                # https://meta.wikimedia.org/wiki/Help:Newlines_and_spaces
-                if stop_conversion:
-                    if not value.endswith(newline_indent):
-                        arg.value += comment_indent
-                elif positional and value != stripped_value:
-                    stop_conversion = True
-                    if not value.endswith(newline_indent):
-                        arg.value += comment_indent
-                elif not_a_parser_function:
-                    arg.name = (
-                        ' '
-                        + stripped_name
-                        + ' '
-                        + ' ' * (max_name_len - arg_name_len)
-                    )
-                    arg.value = ' ' + stripped_value + newline_indent
-
-        for func in reversed(parsed.parser_functions):
-            name = func.name
-            ls_name = name.lstrip(ws)
-            lws = len(name) - len(ls_name)
-            if lws:
-                del func[2 : lws + 2]
-            if ls_name.lower() in ('#tag', '#invoke', ''):
-                # The 2nd argument of `tag` parser function is an exception
-                # and cannot be stripped.
-                # So in `{{#tag:tagname|arg1|...}}`, no whitespace should be
-                # added/removed to/from arg1.
-                # See: [[mw:Help:Extension:ParserFunctions#Miscellaneous]]
-                # All args of #invoke are also whitespace-sensitive.
-                continue
-            args = func.arguments
-            if not args:
-                continue
-            # Whitespace, including newlines, tabs, and spaces is stripped
-            # from the beginning and end of all the parameters of
-            # parser functions. See:
-            # www.mediawiki.org/wiki/Help:Extension:ParserFunctions#
-            #    Stripping_whitespace
-            level = func.nesting_level
-            short_indent = '\n' + indent * (level - 1)
-            newline_indent = short_indent + indent
-            if len(args) == 1:
-                arg = args[0]
-                # the first arg is both the first and last argument
-                if arg.positional:
-                    arg.value = (
-                        newline_indent + arg.value.strip(ws) + short_indent
-                    )
-                else:
-                    # Note that we don't add spaces before and after the
-                    # '=' in parser functions because it could be part of
-                    # an ordinary string.
-                    arg.name = newline_indent + arg.name.lstrip(ws)
-                    arg.value = arg.value.rstrip(ws) + short_indent
-                continue
-            # Special formatting for the first argument
-            arg = args[0]
-            if arg.positional:
-                arg.value = (
-                    newline_indent + arg.value.strip(ws) + newline_indent
-                )
-            else:
-                arg.name = newline_indent + arg.name.lstrip(ws)
-                arg.value = arg.value.rstrip(ws) + newline_indent
-            # Formatting the middle arguments
-            for arg in args[1:-1]:
-                if arg.positional:
-                    arg.value = ' ' + arg.value.strip(ws) + newline_indent
-                else:
-                    arg.name = ' ' + arg.name.lstrip(ws)
-                    arg.value = arg.value.rstrip(ws) + newline_indent
-            # Special formatting for the last argument
-            arg = args[-1]
-            if arg.positional:
-                arg.value = ' ' + arg.value.strip(ws) + short_indent
-            else:
-                arg.name = ' ' + arg.name.lstrip(ws)
-                arg.value = arg.value.rstrip(ws) + short_indent
-
-        return parsed.string
+                s, e, _, _ = node._span_data
+                if s < b or e > se:
+                    continue
+                parts += lststr0[b:s], node.pformat(indent, remove_comments)
+                b = e
+            parts.append(lststr0[b:se])
+            return ''.join(parts)
+        return _pformat(self._subtree_view(), indent, remove_comments)
 
     @property
+    @_memoized
     def parameters(self) -> list[Parameter]:
         """Return a list of parameter objects."""
-        _lststr = self._lststr
-        _type_to_spans = self._type_to_spans
+        node = self._node
         return [
-            Parameter(_lststr, _type_to_spans, span, 'Parameter')
+            node(Parameter, span, 'Parameter')
             for span in self._subspans('Parameter')
         ]
 
     @property
+    @_memoized
     def parser_functions(self) -> list[ParserFunction]:
         """Return a list of parser function objects."""
-        _lststr = self._lststr
-        _type_to_spans = self._type_to_spans
+        node = self._node
         return [
-            ParserFunction(_lststr, _type_to_spans, span, 'ParserFunction')
+            node(ParserFunction, span, 'ParserFunction')
             for span in self._subspans('ParserFunction')
         ]
 
     @property
+    @_memoized
     def templates(self) -> list[Template]:
         """Return a list of templates as template objects."""
-        _lststr = self._lststr
-        _type_to_spans = self._type_to_spans
+        node = self._node
         return [
-            Template(_lststr, _type_to_spans, span, 'Template')
+            node(Template, span, 'Template')
             for span in self._subspans('Template')
         ]
 
     @property
+    @_memoized
     def wikilinks(self) -> list[WikiLink]:
         """Return a list of wikilink objects."""
-        _lststr = self._lststr
-        _type_to_spans = self._type_to_spans
+        node = self._node
         return [
-            WikiLink(_lststr, _type_to_spans, span, 'WikiLink')
+            node(WikiLink, span, 'WikiLink')
             for span in self._subspans('WikiLink')
         ]
 
     @property
+    @_memoized
     def comments(self) -> list[Comment]:
         """Return a list of comment objects."""
-        _lststr = self._lststr
-        _type_to_spans = self._type_to_spans
+        node = self._node
         return [
-            Comment(_lststr, _type_to_spans, span, 'Comment')
+            node(Comment, span, 'Comment')
             for span in self._subspans('Comment')
         ]
 
+    def iter_parameters(self) -> Iterator[Parameter]:
+        """Lazily yield the same objects as `self.parameters`."""
+        return self._iter_nodes(Parameter, 'Parameter')
+
+    def iter_parser_functions(self) -> Iterator[ParserFunction]:
+        """Lazily yield the same objects as `self.parser_functions`."""
+        return self._iter_nodes(ParserFunction, 'ParserFunction')
+
+    def iter_templates(self) -> Iterator[Template]:
+        """Lazily yield the same objects as `self.templates`.
+
+        Useful when only the first few matches are needed, e.g.:
+
+            >>> any(
+            ...     t.normal_name() == 'Infobox'
+            ...     for t in WikiText('{{a}}{{Infobox}}').iter_templates()
+            ... )
+            True
+        """
+        return self._iter_nodes(Template, 'Template')
+
+    def iter_wikilinks(self) -> Iterator[WikiLink]:
+        """Lazily yield the same objects as `self.wikilinks`."""
+        return self._iter_nodes(WikiLink, 'WikiLink')
+
+    def iter_comments(self) -> Iterator[Comment]:
+        """Lazily yield the same objects as `self.comments`."""
+        return self._iter_nodes(Comment, 'Comment')
+
+    def iter_extension_tags(self) -> Iterator[Tag]:
+        """Lazily yield the extension tags, e.g. <ref> or <pre>."""
+        return self._iter_nodes(Tag, 'ExtensionTag')
+
     @property
     def _balanced_quotes_shadow(self) -> bytearray:
         """Return a byte array with non-markup-apostrophes removed.
@@ -549,6 +689,7 @@ class WikiText(WikiTextBase):
         self, *, recursive=True, filter_cls: None = None
     ) -> list[Bold | Italic]: ...
 
+    @_memoized
     def get_bolds_and_italics(
         self,
         *,
@@ -567,8 +708,7 @@ class WikiText(WikiTextBase):
         """
         result = []
         append = result.append
-        _lststr = self._lststr
-        s = self._span_data[0]
+        s, self_end, _, _ = self._span_data
         type_to_spans = self._type_to_spans
         tts_setdefault = type_to_spans.setdefault
         balanced_shadow = self._balanced_quotes_shadow
@@ -576,7 +716,9 @@ class WikiText(WikiTextBase):
 
         if filter_cls is None or filter_cls is Bold:
             bold_spans = tts_setdefault('Bold', [])
-            get_old_bold_span = {(s[0], s[1]): s for s in bold_spans}.get
+            get_old_bold_span = {
+                (s[0], s[1]): s for s in _spans_in(bold_spans, s, self_end)
+            }.get
             bold_matches = list(BOLD_FINDITER(balanced_shadow, rs, re))
             for m in bold_matches:
                 ms, me = m.span()
@@ -587,7 +729,7 @@ class WikiText(WikiTextBase):
                     insort_right(bold_spans, span)
                 else:
                     span = old_span
-                append(Bold(_lststr, type_to_spans, span, 'Bold'))
+                append(self._node(Bold, span, 'Bold'))
             if recursive:
                 self._bolds_italics_recurse(result, filter_cls)
                 if filter_cls is Bold:
@@ -608,7 +750,9 @@ class WikiText(WikiTextBase):
             balanced_shadow[ce:me] = b'_' * (me - ce)
 
         italic_spans = tts_setdefault('Italic', [])
-        get_old_italic_span = {(s[0], s[1]): s for s in italic_spans}.get
+        get_old_italic_span = {
+            (s[0], s[1]): s for s in _spans_in(italic_spans, s, self_end)
+        }.get
         for m in ITALIC_FINDITER(balanced_shadow, rs, re):
             ms, me = m.span()
             b, e = span = s + ms, s + me
@@ -618,9 +762,7 @@ class WikiText(WikiTextBase):
                 insort_right(italic_spans, span)
             else:
                 span = old_span
-            append(
-                Italic(_lststr, type_to_spans, span, 'Bold', me != m.end(1))
-            )
+            append(self._node(Italic, span, 'Bold', me != m.end(1)))
         if recursive and filter_cls is Italic:
             self._bolds_italics_recurse(result, filter_cls)
             result.sort(key=attrgetter('_span_data'))
@@ -664,11 +806,12 @@ class WikiText(WikiTextBase):
         for type_ in 'Template', 'ParserFunction', 'Parameter':
             for s, e, _, _ in subspans(type_):
                 byte_array[s - ss : e - ss] = INVALID_EL_TPP_CHRS_SUB(
-                    b' ', byte_array[s:e]
+                    b' ', byte_array[s - ss : e - ss]
                 )
         return byte_array
 
     @property
+    @_memoized
     def external_links(self) -> list[ExternalLink]:
         """Return a list of found external link objects.
 
@@ -689,10 +832,11 @@ class WikiText(WikiTextBase):
         external_links: list[ExternalLink] = []
         external_links_append = external_links.append
         type_to_spans = self._type_to_spans
-        lststr = self._lststr
         ss, se, _, _ = self._span_data
         spans = type_to_spans.setdefault('ExternalLink', [])
-        span_tuple_to_span_get = {(s[0], s[1]): s for s in spans}.get
+        span_tuple_to_span_get = {
+            (s[0], s[1]): s for s in _spans_in(spans, ss, se)
+        }.get
         el_shadow = self._ext_link_shadow
 
         def _extract(start, end):
@@ -705,12 +849,12 @@ class WikiText(WikiTextBase):
                 else:
                     span = old_span
                 external_links_append(
-                    ExternalLink(lststr, type_to_spans, span, 'ExternalLink')
+                    self._node(ExternalLink, span, 'ExternalLink')
                 )
 
         for s, e, _, _ in self._subspans('ExtensionTag'):
-            _extract(s, e)
-            el_shadow[s:e] = (e - s) * b' '
+            _extract(s - ss, e - ss)
+            el_shadow[s - ss : e - ss] = (e - s) * b' '
         _extract(None, None)
         return external_links
 
@@ -723,7 +867,6 @@ class WikiText(WikiTextBase):
         ss, se, _, ba = self._span_data
         type_spans = type_to_spans.setdefault('Section', [])
         span_tuple_to_span = {(s[0], s[1]): s for s in type_spans}.get
-        lststr = self._lststr
         for ms, me in section_spans:
             s, e = ss + ms, ss + me
             old_span = span_tuple_to_span((s, e))
@@ -732,7 +875,7 @@ class WikiText(WikiTextBase):
                 insort_right(type_spans, span)
             else:
                 span = old_span
-            sections_append(Section(lststr, type_to_spans, span, 'Section'))
+            sections_append(self._node(Section, span, 'Section'))
         return sections
 
     @property
@@ -740,6 +883,7 @@ class WikiText(WikiTextBase):
         """Return self.get_sections(include_subsections=True)."""
         return self.get_sections()
 
+    @_memoized
     def get_sections(
         self,
         *args,
@@ -805,54 +949,44 @@ class WikiText(WikiTextBase):
         """Return a list of all tables."""
         return self.get_tables(True)
 
+    @_memoized
     def get_tables(self, recursive=False) -> list[Table]:
-        """Return tables. Include nested tables if `recursive` is `True`."""
+        """Return tables. Include nested tables if `recursive` is `True`.
+
+        With the default `recursive=False` only top-level tables are returned.
+        """
         type_to_spans = self._type_to_spans
-        lststr = self._lststr
-        shadow_copy = self._shadow[:]
-        ss, se, _, _ = self._span_data
         spans = type_to_spans.setdefault('Table', [])
         spans_append = spans.append
         skip_self_span = self._type == 'Table'
         span_tuple_to_span_get = {(s[0], s[1]): s for s in spans}.get
         return_spans = []
         return_spans_append = return_spans.append
-        shadow_copy_copy = shadow_copy[:]
-
-        def extract_tables_from_shadow():
-            m = True
-            while m:
-                m = False
-                for m in TABLE_FINDITER(shadow_copy, skip_self_span):
-                    ms, me = m.span()
-                    # Ignore leading whitespace using len(m[1]).
-                    s, e = ss + ms, ss + me
-                    old_span = span_tuple_to_span_get((s, e))
-                    if old_span is None:
-                        span = [s, e, None, shadow_copy_copy[ms:me]]
-                        spans_append(span)
-                        return_spans_append(span)
-                    else:
-                        return_spans_append(old_span)
-                    shadow_copy[ms:me] = b'_' * (me - ms)
 
-        extract_tables_from_shadow()
+        def extract_tables_from_shadow(shadow, ss):
+            for ms, me in _table_spans(shadow, skip_self_span):
+                s, e = ss + ms, ss + me
+                old_span = span_tuple_to_span_get((s, e))
+                if old_span is None:
+                    span = [s, e, None, shadow[ms:me]]
+                    spans_append(span)
+                    return_spans_append(span)
+                else:
+                    return_spans_append(old_span)
+
+        extract_tables_from_shadow(self._shadow, self._span_data[0])
 
         for tag in self._extension_tags:
             if tag.name in _parsable_tag_extensions:
-                shadow_copy = tag._shadow[:]
-                shadow_copy_copy = shadow_copy[:]
                 # noinspection PyProtectedMember
-                ss = tag._span_data[0]
-                extract_tables_from_shadow()
+                extract_tables_from_shadow(tag._shadow, tag._span_data[0])
 
         return_spans.sort()
         spans.sort()
         if not recursive:
             return_spans = _outer_spans(return_spans)
-        return [
-            Table(lststr, type_to_spans, sp, 'Table') for sp in return_spans
-        ]
+        node = self._node
+        return [node(Table, sp, 'Table') for sp in return_spans]
 
     @property
     def _lists_shadow_ss(self) -> tuple[bytearray, int]:
@@ -923,13 +1057,13 @@ class WikiText(WikiTextBase):
 
     @property
     def _extension_tags(self):
-        lststr = self._lststr
-        type_to_spans = self._type_to_spans
+        node = self._node
         return [
-            Tag(lststr, type_to_spans, span, 'ExtensionTag')
+            node(Tag, span, 'ExtensionTag')
             for span in self._subspans('ExtensionTag')
         ]
 
+    @_memoized
     def get_tags(self, name=None) -> list[Tag]:
         """Return all tags with the given name."""
         lststr = self._lststr
@@ -937,8 +1071,9 @@ class WikiText(WikiTextBase):
         if name:
             if name in _tag_extensions:
                 string = lststr[0]
+                node = self._node
                 return [
-                    Tag(lststr, type_to_spans, span, 'ExtensionTag')
+                    node(Tag, span, 'ExtensionTag')
                     for span in type_to_spans['ExtensionTag']
                     if match(r'<' + name + r'\b', string, pos=span[0])
                     is not None
@@ -1010,11 +1145,154 @@ class WikiText(WikiTextBase):
                 spans_append(span)
             else:
                 span = old_span
-            tags_append(Tag(lststr, type_to_spans, span, 'Tag'))
+            tags_append(self._node(Tag, span, 'Tag'))
         spans.sort()
         tags.sort(key=attrgetter('_span_data'))
         return tags
 
+    def children(self, type_: str | None = None) -> list[WikiText]:
+        """Return the direct child nodes of self in document order.
+
+        Children are the outermost Template, ParserFunction, WikiLink,
+        Comment, Parameter, and ExtensionTag objects inside self.
+
+        :param type_: only return children of this type, e.g. 'Template'.
+        """
+        node = self._node
+        return [
+            node(SPAN_PARSER_CLASSES[ctype], cspan, ctype)
+            for ctype, cspan in self._tree_children()
+            if type_ is None or ctype == type_
+        ]
+
+    def _top_level_nodes(self, cls: type, type_: str) -> list:
+        """Return the nodes of `type_` that are not nested in the same type."""
+        children = self._tree[1]
+        node = self._node
+        result = []
+        append = result.append
+        stack = self._tree_children()[::-1]
+        pop = stack.pop
+        extend = stack.extend
+        while stack:
+            ctype, cspan = pop()
+            if ctype == type_:
+                append(node(cls, cspan, type_))
+                continue
+            grandchildren = children.get(id(cspan))
+            if grandchildren:
+                extend(reversed(grandchildren))
+        return result
+
+    def get_templates(self, *, top_level_only=False) -> list[Template]:
+        """Return the templates in self.
+
+        :param top_level_only: only return templates that are not nested
+            inside another template of self.
+        """
+        if top_level_only:
+            return self._top_level_nodes(Template, 'Template')
+        return self.templates
+
+    def templates_as_records(
+        self, names: Iterable[str] | None = None, *, strip=True, last_wins=True
+    ) -> list[tuple[str, dict[str, str]]]:
+        """Return a (normal_name, arguments_dict) tuple for each template.
+
+        The dicts are built by `Template.as_dict(strip, last_wins)`, so no
+        Argument objects are created. If `names` is given, only include the
+        templates whose `normal_name()` is one of them.
+
+        Example:
+            >>> WikiText('{{a|1}}{{b|x=2}}').templates_as_records(['b'])
+            [('b', {'x': '2'})]
+        """
+        if names is None:
+            templates: Iterable[Template] = self.iter_templates()
+        else:
+            templates = self.templates_named(names)
+        return [
+            (template.normal_name(), template.as_dict(strip, last_wins))
+            for template in templates
+        ]
+
+    def templates_named(
+        self,
+        names: str | Iterable[str],
+        rm_namespaces=('Template',),
+        *,
+        code: str | None = None,
+        capitalize=False,
+    ) -> list[Template]:
+        """Return the templates whose normal name is one of `names`.
+
+        The other arguments are passed to `Template.normal_name`. The normal
+        names of all the templates of the document are computed once, and
+        then each call is a dictionary lookup until the document is mutated.
+
+        Example:
+            >>> WikiText(
+            ...     '{{Foo_bar}}{{cite}}{{Template:foo bar}}'
+            ... ).templates_named({'Foo bar'}, capitalize=True)
+            [Template('{{Foo_bar}}'), Template('{{Template:foo bar}}')]
+        """
+        if isinstance(names, str):
+            names = (names,)
+        index = self._template_name_index(
+            tuple(rm_namespaces), code, capitalize
+        )
+        self_span = ss, se, _, _ = self._span_data
+        spans = [
+            span
+            for name in {*names}
+            for span in index.get(name, ())
+            if ss <= span[0] and span[1] <= se and span is not self_span
+        ]
+        spans.sort()
+        node = self._node
+        return [node(Template, span, 'Template') for span in spans]
+
+    def _template_name_index(
+        self,
+        rm_namespaces: tuple[str, ...],
+        code: str | None,
+        capitalize: bool,
+    ) -> dict[str, list[list]]:
+        """Return a map from normal names to the spans of the templates.
+
+        The index covers the whole document and is cached on the document
+        until it is mutated.
+        """
+        lststr = self._lststr
+        spans = self._type_to_spans['Template']
+        key = lststr.version, len(spans)
+        options = rm_namespaces, code, capitalize
+        cached_key, index = lststr.template_names.get(options, (None, None))
+        if cached_key == key:
+            return index
+        index = {}
+        node = self._node
+        for span in spans:
+            name = node(Template, span, 'Template').normal_name(
+                rm_namespaces, code=code, capitalize=capitalize
+            )
+            try:
+                index[name].append(span)
+            except KeyError:
+                index[name] = [span]
+        lststr.template_names[options] = key, index
+        return index
+
+    def get_wikilinks(self, *, top_level_only=False) -> list[WikiLink]:
+        """Return the wikilinks in self.
+
+        :param top_level_only: only return wikilinks that are not nested
+            inside another wikilink of self, e.g. image captions.
+        """
+        if top_level_only:
+            return self._top_level_nodes(WikiLink, 'WikiLink')
+        return self.wikilinks
+
     def parent(self, type_: str | None = None) -> WikiText | None:
         """Return None (The parent of the root node is None)."""
         return None
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
 from bisect import bisect_left, bisect_right, insort_right
-
+from functools import wraps
+from operator import itemgetter
 from typing import (
+    Callable,
+    Iterator,
     MutableSequence,
+    TypeVar,
 )
+from weakref import WeakValueDictionary
 from ._spans import (
     TypeToSpans,
     parse_to_spans,
@@ -13,8 +18,218 @@ from ._spans import (
 from ._wikitext_utils import (
     SPAN_PARSER_TYPES,
     DEAD_SPAN,
+    _spans_in,
 )
 
+F = TypeVar('F', bound=Callable)
+W = TypeVar('W', bound='WikiTextBase')
+
+
+class LstStr(list):
+    """A single-item list that holds the string of a parsed document.
+
+    All the objects of a document share the same LstStr instance, therefore it
+    is also used to keep the document-wide state:
+
+    version: incremented on every mutation of the document. Caches that
+        depend on the string or the spans should be keyed on it.
+    memo: the memoized accessor results, None if memoization is disabled.
+    nodes: a weak-valued map from id(span), or (id(span), cls, *args) for
+        nodes with extra constructor args, to the node object of that span.
+        It makes accessors return the same object for the same span as long
+        as that object is alive.
+    tree: the containment tree of SPAN_PARSER_TYPES spans as a
+        (version, parents, children) tuple. See `_build_tree`.
+    levels: maps a tuple of parent types to a (key, levels) pair where
+        levels is the output of `_nesting_levels` for those types.
+    template_names: maps the options of `Template.normal_name` to a
+        (key, index) pair where index maps each normal name to the spans of
+        the templates that have it. See `WikiText.templates_named`.
+    """
+
+    __slots__ = (
+        'version',
+        'memo',
+        'memo_version',
+        'memo_size',
+        'nodes',
+        'tree',
+        'levels',
+        'template_names',
+    )
+
+    def __init__(self, iterable=()) -> None:
+        super().__init__(iterable)
+        self.version = 0
+        self.nodes: WeakValueDictionary = WeakValueDictionary()
+        self.memo: dict | None = None
+        self.memo_version = 0
+        self.memo_size = 0
+        self.tree: tuple | None = None
+        self.levels: dict[tuple, tuple] = {}
+        self.template_names: dict[tuple, tuple] = {}
+
+
+class SubtreeSpans(dict):
+    """The type_to_spans of a subtree, sliced lazily from a document's.
+
+    Only the span lists that are actually used are sliced. The spans are
+    copied with offsets relative to `start`, so that mutating them does not
+    affect the document, but their cached matches and shadows are shared.
+    """
+
+    __slots__ = '_type_to_spans', '_start', '_end'
+
+    def __init__(self, type_to_spans: TypeToSpans, start: int, end: int):
+        super().__init__()
+        self._type_to_spans = type_to_spans
+        self._start = start
+        self._end = end
+
+    def __missing__(self, type_):
+        start = self._start
+        spans = self[type_] = [
+            [s - start, e - start, match, shadow]
+            for s, e, match, shadow in _spans_in(
+                self._type_to_spans[type_], start, self._end
+            )
+        ]
+        return spans
+
+    def setdefault(self, type_, default=None):
+        try:
+            return self[type_]
+        except KeyError:
+            return super().setdefault(type_, default)
+
+    def _slice_all(self) -> None:
+        # Mutations update all the span lists, so slice the remaining ones
+        # before their offsets go out of date.
+        for type_ in self._type_to_spans.keys() - self.keys():
+            self[type_]
+
+    def items(self):
+        self._slice_all()
+        return super().items()
+
+    def values(self):
+        self._slice_all()
+        return super().values()
+
+
+def _build_tree(type_to_spans: TypeToSpans) -> tuple[dict, dict]:
+    """Return the containment tree of the SPAN_PARSER_TYPES spans.
+
+    The tree is built using a single stack sweep over the spans sorted by
+    their start (and reversed end). Each node is a (type_, span) tuple.
+
+    parents: maps id(span) to the innermost node that strictly contains the
+        span, or None for top-level spans.
+    children: maps id(span) to the list of its direct child nodes in document
+        order. The key of top-level nodes is None. Leaves have no key.
+    """
+    nodes = [
+        (span[0], -span[1], type_, span)
+        for type_ in SPAN_PARSER_TYPES
+        for span in type_to_spans[type_]
+    ]
+    nodes.sort(key=itemgetter(0, 1))
+    parents: dict = {}
+    children: dict = {}
+    stack: list = []
+    pop = stack.pop
+    push = stack.append
+    for s, e, type_, span in nodes:
+        e = -e
+        while stack and stack[-1][1] <= s:
+            pop()
+        for ps, pe, parent in reversed(stack):
+            if ps < s and e < pe:
+                parents[id(span)] = parent
+                parent_key = id(parent[1])
+                break
+        else:
+            parents[id(span)] = parent_key = None
+        node = type_, span
+        try:
+            children[parent_key].append(node)
+        except KeyError:
+            children[parent_key] = [node]
+        push((s, e, node))
+    return parents, children
+
+
+def _nesting_levels(span_lists: list[list[list]]) -> dict[int, int]:
+    """Return a map from id(span) to the nesting level of that span.
+
+    The nesting level of a span is the number of the given spans that contain
+    it, including the span itself. All levels are computed using a single
+    stack sweep over the spans sorted by their start (and reversed end).
+    """
+    spans = sorted(
+        [span for spans in span_lists for span in spans], key=_sweep_key
+    )
+    levels = {}
+    ends: list[int] = []  # ends of the spans that may contain the next ones
+    pop = ends.pop
+    push = ends.append
+    for span in spans:
+        s, e, _, _ = span
+        while ends and ends[-1] < s:
+            pop()
+        level = 1
+        for pe in ends:
+            if e <= pe:
+                level += 1
+        levels[id(span)] = level
+        push(e)
+    return levels
+
+
+def _sweep_key(span: list) -> tuple[int, int]:
+    return span[0], -span[1]
+
+
+def _memoized(method: F) -> F:
+    """Memoize the result of an accessor method if enabled on the document.
+
+    The memo is keyed on the span and type of the node, the name of the
+    method, and the arguments. All entries are discarded as soon as the
+    document is mutated. A shallow copy of the memoized list is returned
+    so that callers can freely modify it.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lststr = self._lststr
+        memo = lststr.memo
+        if memo is None:
+            return method(self, *args, **kwargs)
+        if lststr.memo_version != lststr.version:
+            memo.clear()
+            lststr.memo_version = lststr.version
+        try:
+            key = (
+                id(self._span_data),
+                type(self),
+                name,
+                args,
+                (*kwargs.items(),),
+            )
+            result = memo.pop(key)
+        except TypeError:  # unhashable arguments
+            return method(self, *args, **kwargs)
+        except KeyError:
+            result = method(self, *args, **kwargs)
+            if len(memo) >= lststr.memo_size:
+                # evict the least recently used entry
+                del memo[next(iter(memo))]
+        memo[key] = result
+        return result[:]
+
+    return wrapper  # type: ignore
+
 
 class WikiTextBase:
     # In subclasses of WikiText _type is used as the key for _type_to_spans
@@ -22,7 +237,7 @@ class WikiTextBase:
     # The following class attribute acts as a default value.
     _type = 'WikiTextBase'
 
-    __slots__ = '_type_to_spans', '_lststr', '_span_data'
+    __slots__ = '_type_to_spans', '_lststr', '_span_data', '__weakref__'
 
     def __init__(
         self,
@@ -43,7 +258,7 @@ class WikiTextBase:
             self._type_to_spans = _type_to_spans
             self._lststr: MutableSequence[str] = string  # type: ignore
             return
-        self._lststr: MutableSequence[str] = [string]  # type: ignore
+        self._lststr: MutableSequence[str] = LstStr((string,))  # type: ignore
         byte_array = bytearray(string, 'ascii', 'replace')  # type: ignore
         span = self._span_data = [0, len(string), None, byte_array]
         _type = self._type
@@ -183,6 +398,7 @@ class WikiTextBase:
         lststr = self._lststr
         lststr0 = lststr[0]
         lststr[0] = lststr0[:abs_start] + value + lststr0[abs_stop:]
+        lststr.version += 1
         # Set the length of all subspans to zero because
         # they are all being replaced.
         self._close_subspans(abs_start, abs_stop)
@@ -218,6 +434,7 @@ class WikiTextBase:
         lststr = self._lststr
         lststr0 = lststr[0]
         lststr[0] = lststr0[:start] + lststr0[stop:]
+        lststr.version += 1
         # Update spans
         self._del_update(start, stop)
 
@@ -242,6 +459,7 @@ class WikiTextBase:
         index += ss
         # Update lststr
         lststr[0] = lststr0[:index] + string + lststr0[index:]
+        lststr.version += 1
         string_len = len(string)
         # Update spans
         self._insert_update(index=index, length=string_len)
@@ -255,6 +473,135 @@ class WikiTextBase:
                     [index + s, index + e, None, byte_array],
                 )
 
+    def _replace_ranges(self, edits: list[tuple[int, int, str]]) -> None:
+        """Replace several ranges of self.string in a single edit.
+
+        `edits` are (start, stop, value) tuples relative to self, sorted and
+        non-overlapping. start == stop means an insertion.
+
+        The string is rebuilt once and every span is moved once, instead of
+        one pass over all the spans per edit. Like `__setitem__`, the spans
+        that lie inside a replaced range are closed and the spans of the new
+        values are added. Like `insert`, a span that ends where a value is
+        inserted grows and a span that starts there is moved after it.
+        """
+        if not edits:
+            return
+        self_span = self._span_data
+        ss = self_span[0]
+        starts = [ss + s for s, _, _ in edits]
+        stops = [ss + e for _, e, _ in edits]
+        values = [v for _, _, v in edits]
+        # shifts[i] is the total length change of the first i edits
+        shifts = [0]
+        shift = 0
+        for start, stop, value in zip(starts, stops, values):
+            shift += len(value) + start - stop
+            shifts.append(shift)
+        lststr = self._lststr
+        lststr0 = lststr[0]
+        parts = []
+        append = parts.append
+        pos = 0
+        for start, stop, value in zip(starts, stops, values):
+            append(lststr0[pos:start])
+            append(value)
+            pos = stop
+        append(lststr0[pos:])
+        lststr[0] = ''.join(parts)
+        lststr.version += 1
+        first_start = starts[0]
+        last_stop = stops[-1]
+        edits_len = len(edits)
+        for spans in self._type_to_spans.values():
+            if not spans:
+                continue
+            kept = []
+            keep = kept.append
+            for span in spans:
+                s, e, _, _ = span
+                if e < first_start:
+                    keep(span)
+                    continue
+                if s > last_stop:
+                    span[0] = s + shift
+                    span[1] = e + shift
+                    span[2] = span[3] = None
+                    keep(span)
+                    continue
+                # the edits whose stop <= s
+                i = bisect_right(stops, s)
+                if i < edits_len and starts[i] <= s:
+                    # s is inside of a replaced range
+                    if e <= stops[i] and span is not self_span:
+                        span[:] = DEAD_SPAN
+                        continue
+                    new_s = starts[i] + shifts[i]
+                else:
+                    new_s = s + shifts[i]
+                # the edits whose stop <= e
+                j = bisect_right(stops, e)
+                if j < edits_len and starts[j] < e:
+                    # e is inside of a replaced range
+                    new_e = starts[j] + shifts[j] + len(values[j])
+                else:
+                    new_e = e + shifts[j]
+                span[0] = new_s
+                span[1] = new_e
+                span[2] = span[3] = None
+                keep(span)
+            spans[:] = kept
+        # Add the newly added spans contained in the values.
+        type_to_spans = self._type_to_spans
+        for start, value, shift in zip(starts, values, shifts):
+            if not value:
+                continue
+            start += shift
+            for type_, value_spans in parse_to_spans(
+                bytearray(value, 'ascii', 'replace')
+            ).items():
+                tts = type_to_spans[type_]
+                for s, e, m, ba in value_spans:
+                    try:
+                        insort_right(tts, [start + s, start + e, m, ba])
+                    except TypeError:
+                        # already exists which has lead to comparing Matches
+                        continue
+
+    def memoize(self, maxsize: int | None = 128) -> None:
+        """Enable memoization of accessor results for the whole document.
+
+        Once enabled, repeated calls to accessors like `templates`,
+        `sections`, `get_tables()`, `external_links`, `get_tags()`, and
+        `get_bolds_and_italics()` reuse the previously computed result until
+        the document is mutated.
+
+        :param maxsize: maximum number of memoized results to keep. The least
+            recently used ones are discarded first. Use 0 or None to disable
+            memoization.
+        """
+        lststr = self._lststr
+        if not maxsize:
+            lststr.memo = None
+            return
+        if lststr.memo is None:
+            lststr.memo = {}
+        lststr.memo_size = maxsize
+        memo = lststr.memo
+        while len(memo) > maxsize:
+            del memo[next(iter(memo))]
+
+    def invalidate(self) -> None:
+        """Discard the memoized and cached results of the whole document.
+
+        There is usually no need to call this method as any mutation via the
+        API of this package invalidates the caches automatically.
+        """
+        lststr = self._lststr
+        lststr.version += 1
+        if lststr.memo is not None:
+            lststr.memo.clear()
+
     @property
     def span(self) -> tuple:
         """Return the span of self relative to the start of the root node."""
@@ -278,10 +625,105 @@ class WikiTextBase:
     def string(self) -> None:
         del self[:]
 
+    def _node(self, cls: type[W], span: list, type_: str | int, *args) -> W:
+        """Return the node object of the given span and class.
+
+        Reuse the previously created object if it is still alive, so that the
+        same span always yields the same object and its caches survive.
+        `args` are passed to the constructor after the `_type` parameter.
+        They are part of the key, e.g. an Italic whose closing token has
+        been added by an edit is a new object.
+        """
+        lststr = self._lststr
+        nodes = lststr.nodes
+        key = (id(span), cls, *args) if args else id(span)
+        node = nodes.get(key)
+        if type(node) is cls:
+            return node  # type: ignore
+        node = nodes[key] = cls(
+            lststr, self._type_to_spans, span, type_, *args
+        )
+        return node
+
+    @property
+    def _tree(self) -> tuple[dict, dict]:
+        """Return the (parents, children) containment tree of the document.
+
+        The tree is built on first use and rebuilt lazily after mutations.
+        """
+        lststr = self._lststr
+        tree = lststr.tree
+        version = lststr.version
+        if tree is None or tree[0] != version:
+            tree = lststr.tree = (version, *_build_tree(self._type_to_spans))
+        return tree[1], tree[2]
+
+    def _tree_children(self) -> list[tuple]:
+        """Return the (type_, span) nodes directly below self in the tree.
+
+        For spans that are not part of the tree, e.g. sections or
+        arguments, return the children of the innermost containing node that
+        lie within self.
+        """
+        parents, children = self._tree
+        span = self._span_data
+        key = id(span)
+        if key in parents:
+            return children.get(key, [])
+        ss, se, _, _ = span
+        container = self._tree_container()
+        return [
+            node
+            for node in children.get(
+                None if container is None else id(container[1]), ()
+            )
+            if ss <= node[1][0] and node[1][1] <= se
+        ]
+
+    def _tree_container(self) -> tuple | None:
+        """Return the innermost (type_, span) node that strictly contains self.
+
+        Return None if there is no such node.
+        """
+        parents, children = self._tree
+        span = self._span_data
+        key = id(span)
+        if key in parents:
+            return parents[key]
+        ss, se, _, _ = span
+        container = None
+        nodes = children.get(None, ())
+        while nodes:
+            for node in nodes:
+                s, e, _, _ = node[1]
+                if s >= ss:
+                    return container
+                if se < e:
+                    container = node
+                    nodes = children.get(id(node[1]), ())
+                    break
+            else:
+                return container
+        return container
+
     def _subspans(self, type_: str) -> list[list[int]]:
         """Return all the sub-span including self._span."""
         return self._type_to_spans[type_]
 
+    def _iter_subspans(self, type_: str) -> Iterator[list]:
+        """Lazily yield the same spans as `self._subspans(type_)`."""
+        return iter(self._type_to_spans[type_])
+
+    def _iter_nodes(self, cls: type[W], type_: str) -> Iterator[W]:
+        """Yield the node objects of the sub-spans of the given type.
+
+        Objects are created on demand, so stopping early is cheap. Do not
+        mutate the document while iterating.
+        """
+        node = self._node
+        for span in self._iter_subspans(type_):
+            yield node(cls, span, type_)
+
     def _close_subspans(self, start: int, stop: int) -> None:
         """Close all sub-spans of (start, stop)."""
         ss, se, _, _ = self._span_data
@@ -376,12 +818,27 @@ class WikiTextBase:
                     ):
                         span[0] += length
 
-    def _nesting_level(self, parent_types) -> int:
+    def _nesting_level(self, parent_types: tuple[str, ...]) -> int:
+        """Return the number of `parent_types` spans that contain self.
+
+        The levels of all the spans of the document are computed at once
+        and reused until the document is mutated or new spans are added.
+        """
+        lststr = self._lststr
+        type_to_spans = self._type_to_spans
+        span_lists = [type_to_spans[type_] for type_ in parent_types]
+        key = lststr.version, *map(len, span_lists)
+        cached_key, levels = lststr.levels.get(parent_types, (None, None))
+        if cached_key != key:
+            levels = _nesting_levels(span_lists)
+            lststr.levels[parent_types] = key, levels
+        level = levels.get(id(self._span_data))  # type: ignore
+        if level is not None:
+            return level
+        # self is not one of the parent_types spans
         ss, se, _, _ = self._span_data
         level = 0
-        type_to_spans = self._type_to_spans
-        for type_ in parent_types:
-            spans = type_to_spans[type_]
+        for spans in span_lists:
             for s, e, _, _ in spans[: bisect_right(spans, [ss + 1])]:
                 if se <= e:
                     level += 1
@@ -425,19 +882,3 @@ class WikiTextBase:
         else:
             parse_to_spans(shadow)
         return shadow
-
-    def _inner_type_to_spans_copy(self) -> TypeToSpans:
-        """Create the arguments for the parse function used in pformat method.
-
-        Only return sub-spans and change them to fit the new scope, i.e self.string.
-        """
-        ss, se, _, _ = self._span_data
-        return {
-            type_: [
-                [s - ss, e - ss, m, ba[:] if ba is not None else None]
-                for s, e, m, ba in spans[
-                    bisect_right(spans, [ss]) : bisect_right(spans, [se])
-                ]
-            ]
-            for type_, spans in self._type_to_spans.items()
-        }
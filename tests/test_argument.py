@@ -0,0 +1,40 @@
+from wikitextparser import Argument, parse
+
+
+def test_positional_names():
+    template = parse('{{t|a|b=1|c| d |2=e|f}}').templates[0]
+    assert [a.name for a in template.arguments] == [
+        '1', 'b', '2', '3', '2', '4'
+    ]
+
+
+def test_positional_names_of_parser_functions():
+    pf = parse('{{#if:a|b=c|d}}').parser_functions[0]
+    assert [a.name for a in pf.arguments] == ['1', 'b', '2']
+
+
+def test_positional_names_after_edits():
+    wikitext = parse('{{t|a|b|c}}')
+    template = wikitext.templates[0]
+    c = template.arguments[2]
+    assert c.name == '3'
+    template.arguments[0].value = 'x=y'
+    assert c.name == '2'
+    wikitext.insert(4, 'z|')
+    assert c.name == '3'
+    assert c.string == '|c'
+
+
+def test_name_of_an_argument_that_is_no_longer_an_argument():
+    # The arguments of the parent are not re-split at the equal sign, so
+    # the old argument keeps its span and is numbered by the rule above.
+    template = parse('{{t|a|b|c}}').templates[0]
+    a, b, c = template.arguments
+    b.string = '|b|x=1'
+    assert [arg.name for arg in template.arguments] == ['1', '2', 'x', '3']
+    assert c.name == '3'
+
+
+def test_name_of_detached_argument():
+    assert Argument('|a').name == '1'
+    assert Argument('|a=b').name == 'a'
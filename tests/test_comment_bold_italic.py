@@ -0,0 +1,22 @@
+from wikitextparser import parse
+
+
+def test_italic_end_token_is_updated_by_edits():
+    wt = parse("''a")
+    italic = wt.get_italics()[0]
+    assert italic.end_token is False
+    wt.insert(len(wt.string), "''")
+    new_italic = wt.get_italics()[0]
+    assert new_italic.end_token is True
+    assert new_italic.text == 'a'
+    new_italic.text = 'X'
+    assert wt.string == "''X''"
+
+
+def test_italic_node_is_reused_while_end_token_is_the_same():
+    wt = parse("''a'' b")
+    italic = wt.get_italics()[0]
+    assert wt.get_italics()[0] is italic
+    wt.insert(len(wt.string), ' c')
+    assert wt.get_italics()[0] is italic
+    assert italic.text == 'a'
@@ -0,0 +1,239 @@
+from pytest import mark
+from wcwidth import wcswidth
+
+from wikitextparser import parse
+
+WS = '\r\n\t '
+
+
+def edit_based_pformat(node, indent='    ', remove_comments=False):
+    """Return the pformat of node by editing a parsed copy in place.
+
+    This is the algorithm that the single-pass builder replaced. The
+    builder must produce the same output.
+    """
+    ws = WS
+    parsed = parse(node.string)
+    if remove_comments:
+        for c in parsed.comments:
+            del c[:]
+    else:
+        for c in parsed.comments:
+            if not c.contents.strip(ws):
+                del c[:]
+    for template in reversed(parsed.templates):
+        stripped_tl_name = template.name.strip(ws)
+        template.name = (
+            ' ' + stripped_tl_name + ' '
+            if stripped_tl_name[0] == '{'
+            else stripped_tl_name
+        )
+        args = template.arguments
+        if not args:
+            continue
+        not_a_parser_function = ':' not in stripped_tl_name
+        arg_stripped_names = [a.name.strip(ws) for a in args]
+        arg_positionalities = [a.positional for a in args]
+        arg_name_lengths = [
+            wcswidth(n.replace('لا', '?')) if not p else 0
+            for n, p in zip(arg_stripped_names, arg_positionalities)
+        ]
+        max_name_len = max(arg_name_lengths)
+        level = template.nesting_level
+        newline_indent = '\n' + indent * level
+        template.name += newline_indent
+        if level == 1:
+            last_comment_indent = '<!--\n-->'
+        else:
+            last_comment_indent = '<!--\n' + indent * (level - 2) + ' -->'
+        last_arg = args.pop()
+        last_is_positional = arg_positionalities.pop()
+        last_value = last_arg.value
+        last_stripped_value = last_value.strip(ws)
+        if last_is_positional and last_value != last_stripped_value:
+            stop_conversion = True
+            if not last_value.endswith('\n' + indent * (level - 1)):
+                last_arg.value = last_value + last_comment_indent
+        elif not_a_parser_function:
+            stop_conversion = False
+            last_arg.name = (
+                ' '
+                + arg_stripped_names.pop()
+                + ' '
+                + ' ' * (max_name_len - arg_name_lengths.pop())
+            )
+            last_arg.value = (
+                ' ' + last_stripped_value + '\n' + indent * (level - 1)
+            )
+        elif last_is_positional:
+            stop_conversion = True
+            last_arg.value = last_value + last_comment_indent
+        else:
+            stop_conversion = True
+            last_arg.name = ' ' + last_arg.name.lstrip(ws)
+            if not last_value.endswith('\n' + indent * (level - 1)):
+                last_arg.value = (
+                    last_value.rstrip(ws) + ' ' + last_comment_indent
+                )
+        if not args:
+            continue
+        comment_indent = '<!--\n' + indent * (level - 1) + ' -->'
+        for arg, stripped_name, positional, arg_name_len in zip(
+            reversed(args),
+            reversed(arg_stripped_names),
+            reversed(arg_positionalities),
+            reversed(arg_name_lengths),
+        ):
+            value = arg.value
+            stripped_value = value.strip(ws)
+            if stop_conversion:
+                if not value.endswith(newline_indent):
+                    arg.value += comment_indent
+            elif positional and value != stripped_value:
+                stop_conversion = True
+                if not value.endswith(newline_indent):
+                    arg.value += comment_indent
+            elif not_a_parser_function:
+                arg.name = (
+                    ' '
+                    + stripped_name
+                    + ' '
+                    + ' ' * (max_name_len - arg_name_len)
+                )
+                arg.value = ' ' + stripped_value + newline_indent
+    for func in reversed(parsed.parser_functions):
+        name = func.name
+        ls_name = name.lstrip(ws)
+        lws = len(name) - len(ls_name)
+        if lws:
+            del func[2 : lws + 2]
+        if ls_name.lower() in ('#tag', '#invoke', ''):
+            continue
+        args = func.arguments
+        if not args:
+            continue
+        level = func.nesting_level
+        short_indent = '\n' + indent * (level - 1)
+        newline_indent = short_indent + indent
+        last = len(args) - 1
+        for i, arg in enumerate(args):
+            head = newline_indent if i == 0 else ' '
+            tail = short_indent if i == last else newline_indent
+            if arg.positional:
+                arg.value = head + arg.value.strip(ws) + tail
+            else:
+                arg.name = head + arg.name.lstrip(ws)
+                arg.value = arg.value.rstrip(ws) + tail
+    return parsed.string
+
+
+STRINGS = [
+    '',
+    'plain',
+    'a {{b|c=d}} [[e|f]]\n{|\n|a||b\n|}',
+    '{{a|b|c=d|e}}',
+    '{{a|{{b|{{c|x=1}}}}|y= 2 }}',
+    '{{t|a|b=1|c|d= {{u|x}} |e}}',
+    '{{t|\n a = 1 \n| bb = 2\n}}',
+    '{{t| a |b}} {{t|a| b }} {{t|1=a|b}}',
+    '{{ {{name}} |a=1}} {{ foo |1= a }}',
+    '{{t|ناملا=1|longer name=2|ü=3}}',
+    '{{t|a<!---->=1|b<!-- x -->=2}}',
+    '{{t|a=\n== h ==\n|b=1}}',
+    '{{#if:{{{1|}}}|yes|no}} {{#tag:ref|x}} {{#invoke:m|f|a}}',
+    '{{#switch: x | a = 1 | b = 2 | #default = 3 }}',
+    '{{ #if: a | {{t|x=1}} | {{#if: b | c }} }}',
+    '{{t|x={{#if:a|b| c }}|yy={{#expr: 1 + 2 }}}}',
+    '{{t|{{#if:a|b}}=1|c=2}}',
+    '{{t|x=1<!-- c -->}}<!-- -->{{u|<!---->y}}',
+    '<ref name="a">x {{cite|t=1}}</ref> <br/> <span>{{t|a}}</span>',
+    "''{{b|c=d}}'' '''{{#if:a|b}}''' ''[[l|{{t|x}}]]''",
+    '{{{p|{{t|a=1}}}}} [http://example.com {{t|b=2}}]',
+    '{{Infobox\n| name = A\n| birth = {{birth date|1900|1|1}}\n| 1 = p\n}}',
+    '== s ==\n{{t|a=1}}\n=== t ===\n{{#if:x|{{u|b=2}}}}',
+]
+
+
+def sub_nodes(wikitext):
+    # The nodes of the document that do not end inside a template, parser
+    # function or comment.
+    nodes = (
+        wikitext.templates
+        + wikitext.parser_functions
+        + wikitext.wikilinks
+        + wikitext.comments
+        + wikitext.parameters
+        + wikitext.get_tags()
+        + wikitext.sections
+        + wikitext.external_links
+        + wikitext.get_bolds_and_italics(recursive=True)
+    )
+    for node in wikitext.templates + wikitext.parser_functions:
+        nodes += node.arguments
+    crossables = (
+        wikitext.templates + wikitext.parser_functions + wikitext.comments
+    )
+    return [
+        node
+        for node in nodes
+        if not any(c.span[0] < node.span[1] < c.span[1] for c in crossables)
+    ]
+
+
+@mark.parametrize('string', STRINGS)
+@mark.parametrize('args', [(), ('\t', True), ('  ', False)])
+def test_pformat_matches_the_edit_based_pformat(string, args):
+    wikitext = parse(string)
+    assert wikitext.pformat(*args) == edit_based_pformat(wikitext, *args)
+    for node in sub_nodes(wikitext):
+        assert node.pformat(*args) == edit_based_pformat(node, *args)
+    assert wikitext.string == string
+
+
+def test_pformat_and_plain_text_of_italics():
+    wikitext = parse("a ''{{b|c=d}}'' ''y")
+    italic, unclosed = wikitext.get_italics()
+    assert italic.pformat() == "''{{b\n    | c = d\n}}''"
+    assert unclosed.pformat() == "''y"
+    assert unclosed.plain_text() == parse("''y").plain_text() == 'y'
+
+
+def test_pformat_keeps_nodes_that_cross_the_end_of_self():
+    # The external link ends inside the template, which is kept as is.
+    wikitext = parse('[http://a.b x {{t|y]|z}}')
+    external_link = wikitext.external_links[0]
+    assert external_link.string == '[http://a.b x {{t|y]'
+    assert external_link.pformat() == '[http://a.b x {{t|y]'
+    assert wikitext.pformat() == (
+        '[http://a.b x {{t\n    | 1 = y]\n    | 2 = z\n}}'
+    )
+
+
+def test_pformat_of_the_given_nodes():
+    wikitext = parse('a {{b|c=d}} e {{#if:f|{{g|h=i}}}} <!-- j --> {{k|l}}')
+    b, g, k = wikitext.templates
+    (pf,) = wikitext.parser_functions
+    assert wikitext.pformat(nodes=[k, b]) == (
+        'a '
+        + b.pformat()
+        + ' e {{#if:f|{{g|h=i}}}} <!-- j --> '
+        + k.pformat()
+    )
+    # Nodes inside, or starting inside, another given node are skipped.
+    assert wikitext.pformat(nodes=[g, pf, g]) == (
+        'a {{b|c=d}} e ' + pf.pformat() + ' <!-- j --> {{k|l}}'
+    )
+    assert wikitext.pformat('\t', True, nodes=[pf]) == (
+        'a {{b|c=d}} e ' + pf.pformat('\t', True) + ' <!-- j --> {{k|l}}'
+    )
+    assert wikitext.pformat(nodes=[]) == wikitext.string
+    assert wikitext.pformat(nodes=iter(())) == wikitext.string
+
+
+def test_pformat_of_the_given_nodes_of_a_sub_node():
+    wikitext = parse('{{a|{{b|x=1}}}} {{c|y=2}}')
+    a, b, c = wikitext.templates
+    argument = a.arguments[0]
+    # c is not inside the argument.
+    assert argument.pformat(nodes=[b, c]) == '|' + b.pformat()
+    assert wikitext.string == '{{a|{{b|x=1}}}} {{c|y=2}}'
@@ -0,0 +1,255 @@
+from itertools import islice
+from math import isnan
+from tracemalloc import get_traced_memory, start, stop
+
+from pytest import importorskip, mark, raises
+
+from wikitextparser import Table, _table, parse
+
+TABLE = '''{|
+! colspan=2 | Pop !! Name !! Name
+|-
+! a !! b !! !!
+|-
+| 1 || 2.5 || x ||
+|-
+| 3 || || y || 9999999999999999999999
+|-
+| rowspan=2 | 4 || 1e3 || ||
+|}'''
+
+
+def test_to_columns_without_numpy(monkeypatch):
+    monkeypatch.setattr(_table, 'np', None)
+    assert Table(TABLE).to_columns(2) == {
+        'Pop a': [1, 3, 4, 4],
+        'Pop b': [2.5, None, 1000.0, None],
+        'Name': ['x', 'y', '', None],
+        'Name.1': [None, 9999999999999999999999, None, None],
+    }
+    assert Table(TABLE).to_columns(0, False) == {
+        str(i): [*column] for i, column in enumerate(zip(*Table(TABLE).data()))
+    }
+
+
+def test_to_columns_with_numpy():
+    np = importorskip('numpy')
+    columns = Table(TABLE).to_columns(2)
+    assert [*columns] == ['Pop a', 'Pop b', 'Name', 'Name.1']
+    assert columns['Pop a'].dtype == np.int64
+    assert columns['Pop a'].tolist() == [1, 3, 4, 4]
+    pop_b = columns['Pop b'].tolist()
+    assert pop_b[::2] == [2.5, 1000.0]
+    assert isnan(pop_b[1]) and isnan(pop_b[3])
+    assert columns['Name'].dtype == object
+    assert columns['Name'].tolist() == ['x', 'y', '', None]
+
+
+def test_to_columns_pads_columns_that_start_in_later_rows(monkeypatch):
+    monkeypatch.setattr(_table, 'np', None)
+    table = Table('{|\n|a\n|-\n|b||c\n|-\n|d||e||f\n|}')
+    assert table.to_columns(0, False) == {
+        '0': ['a', 'b', 'd'],
+        '1': [None, 'c', 'e'],
+        '2': [None, None, 'f'],
+    }
+
+
+def test_to_columns_of_empty_tables():
+    assert Table('{|\n|}').to_columns() == {}
+    assert Table('{|\n|-\n|}').to_columns() == {}
+
+
+def test_update_cells():
+    table = Table('{|\n| a || b\n|-\n| colspan=2 |  c \n|}')
+    table.update_cells({(0, 1): 'x', (1, 1): 'y'})
+    assert table.string == '{|\n| a || x\n|-\n| colspan=2 |  y \n|}'
+    table.update_cells({(1, 0): 'z'}, span=False)
+    assert table.data() == [['a', 'x'], ['z', 'z']]
+
+
+@mark.parametrize(
+    'row, column, span',
+    [(2, 0, True), (0, 2, True), (-1, 0, True), (0, -1, True), (1, 1, False)],
+)
+def test_update_cells_raises_value_error_without_a_cell(row, column, span):
+    table = Table('{|\n| a || b\n|-\n| colspan=2 | c\n|}')
+    string = table.string
+    with raises(ValueError):
+        table.update_cells({(row, column): 'x'}, span)
+    assert table.string == string
+
+
+def test_set_data():
+    table = Table('{|\n| a || b\n|-\n| c || d\n|}')
+    table.set_data([[None, 'x'], ['c']])
+    assert table.string == '{|\n| a || x\n|-\n| c || d\n|}'
+    table.set_data([['a', 'x', None], [], [None]])
+    assert table.string == '{|\n| a || x\n|-\n| c || d\n|}'
+
+
+@mark.parametrize('grid', [[['a', 'b', 'x']], [[], [], ['x']]])
+def test_set_data_raises_value_error_for_a_larger_grid(grid):
+    table = Table('{|\n| a || b\n|-\n| c || d\n|}')
+    string = table.string
+    with raises(ValueError):
+        table.set_data(grid)
+    assert table.string == string
+
+
+def tables(string):
+    return [t.string for t in parse(string).get_tables(True)]
+
+
+def test_get_tables_nested():
+    wikitext = parse('{|\n| a\n{|\n| b\n{|\n|c\n|}\n|}\n|}\n{|\n|d\n|}')
+    assert [(t.span, t.nesting_level) for t in wikitext.get_tables(True)] == [
+        ((0, 28), 0),
+        ((7, 25), 1),
+        ((14, 22), 2),
+        ((29, 37), 0),
+    ]
+    assert [t.span for t in wikitext.get_tables()] == [(0, 28), (29, 37)]
+    assert [t.span for t in wikitext.tables] == [
+        t.span for t in wikitext.get_tables(True)
+    ]
+
+
+def test_get_tables_indented_starts():
+    assert tables(':{|\n| a\n|}\n:: {|\n|b\n|}\n x {|\n|c\n|}') == [
+        '{|\n| a\n|}',
+        '{|\n|b\n|}',
+    ]
+
+
+def test_get_tables_in_tags_comments_and_templates():
+    assert tables('<ref>\n{|\n|a\n|}\n</ref>') == ['{|\n|a\n|}']
+    assert tables('<pre>\n{|\n|a\n|}\n</pre>') == []
+    assert tables('<!--\n{|\n|a\n|}\n-->\n{|\n|b\n|}') == ['{|\n|b\n|}']
+    assert tables('{{t|\n{|\n|a\n|}\n}}') == []
+
+
+def test_get_tables_unterminated_and_stray_ends():
+    assert tables('{|\n|a\n') == ['{|\n|a\n']
+    # The end of the inner table is not used for the outer one.
+    assert tables('{|\n|a\n{|\n|b\n|}\n') == [
+        '{|\n|a\n{|\n|b\n|}\n',
+        '{|\n|b\n|}',
+    ]
+    assert tables('|}\n{|\n|a\n|}\n|}\n') == ['{|\n|a\n|}']
+
+
+ITER_ROWS_TABLES = [
+    '{|\n|a||b\n|-\n|c||d\n|}',
+    '{|\n! h1 !! h2\n|-\n| rowspan=2 | a || b\n|-\n| c\n|}',
+    '{|\n| colspan=2 | a\n|-\n| b || c\n|-\n| rowspan=0 | d || e\n|-\n| f\n|}',
+    '{|\n|}',
+]
+
+
+def padded(rows):
+    width = max(map(len, rows), default=0)
+    return [row + [None] * (width - len(row)) for row in rows]
+
+
+@mark.parametrize('string', ITER_ROWS_TABLES)
+@mark.parametrize('span', [True, False])
+@mark.parametrize('strip', [True, False])
+def test_iter_rows_matches_data_and_cells(string, span, strip):
+    table = Table(string)
+    rows = [*table.iter_rows(span, strip)]
+    assert padded(rows) == padded(table.data(span, strip))
+    if not strip:
+        assert padded(rows) == padded(
+            [[c and c.value for c in row] for row in table.cells(span=span)]
+        )
+    table.data()  # iter_rows uses the cached matches, too
+    assert [*table.iter_rows(span, strip)] == rows
+
+
+def test_iter_rows_does_not_widen_earlier_rows():
+    table = Table(
+        '{|\n! h1 !! h2\n|-\n| rowspan=2 | a || colspan=2 | b\n|-\n| c\n|}'
+    )
+    assert [*table.iter_rows()] == [
+        ['h1', 'h2'],
+        ['a', 'b', 'b'],
+        ['a', 'c', None],
+    ]
+    assert table.data()[0] == ['h1', 'h2', None]
+
+
+def test_cells_after_cell_value_edits():
+    wikitext = parse('x\n{|\n| a || b\n|-\n| rowspan=2 | c || d\n|-\n| e\n|}')
+    table = wikitext.tables[0]
+    table.cells(0, 1).value = ' longer value '
+    assert [[c and c.value for c in row] for row in table.cells()] == [
+        [' a ', ' longer value '],
+        [' c ', ' d'],
+        [' c ', ' e'],
+    ]
+    assert table.cells(1, 1).value == ' d'
+    table.cells(1, 0).value = 'C'
+    assert table.cells(2, 0).value == 'C'
+    assert table.cells(1, 0).string == '\n| rowspan=2 |C'
+    table.cells(2, 1).value = ' ee'
+    assert [c.string for c in table.cells(row=2)] == [
+        '\n| rowspan=2 |C',
+        '\n| ee',
+    ]
+    assert table.data() == [['a', 'longer value'], ['C', 'd'], ['C', 'ee']]
+    assert table.data() == parse(wikitext.string).tables[0].data()
+
+
+@mark.parametrize(
+    'string, data',
+    [
+        (  # rowspan=0 spans to the end of the table
+            '{|\n| rowspan=0 | a || b\n|-\n| c\n|-\n| d\n|}',
+            [['a', 'b'], ['a', 'c'], ['a', 'd']],
+        ),
+        (  # colspan=0 is treated as 1
+            '{|\n| colspan=0 | a || b\n|-\n| c || d || e\n|}',
+            [['a', 'b', None], ['c', 'd', 'e']],
+        ),
+        (
+            '{|\n| rowspan="2" | a || colspan=\'2\' | b\n|-\n| c\n|}',
+            [['a', 'b', 'b'], ['a', 'c', None]],
+        ),
+        (  # only the leading digits count, anything else is 1
+            '{|\n| rowspan=x | a || colspan=2abc | b || colspan=-1 | c'
+            ' || rowspan= 2 | d\n|-\n| e\n|}',
+            [['a', 'b', 'b', 'c', 'd'], ['e', None, None, None, 'd']],
+        ),
+        (
+            '{|\n| rowspan=3 | a || b\n|-\n| colspan=3 | c\n|-\n| d || e\n|}',
+            [
+                ['a', 'b', None, None],
+                ['a', 'c', 'c', 'c'],
+                ['a', 'd', 'e', None],
+            ],
+        ),
+        (  # overlapping cells, the later one wins
+            '{|\n| a || rowspan=2 colspan=2 | b\n|-\n| colspan=3 | c\n|}',
+            [['a', 'b', 'b'], ['c', 'c', 'c']],
+        ),
+    ],
+)
+def test_data_with_spans(string, data):
+    table = Table(string)
+    assert table.data() == data
+    assert padded([*table.iter_rows()]) == data
+
+
+def test_very_large_spans_are_not_expanded_per_cell():
+    table = Table('{|\n| rowspan=10000 colspan=10000 | a || b\n|-\n| c\n|}')
+    start()
+    try:
+        first, second = islice(table.iter_rows(), 2)
+        peak = get_traced_memory()[1]
+    finally:
+        stop()
+    assert first == ['a'] * 10000 + ['b']
+    assert second == ['a'] * 10000 + ['c']
+    # A dense grid of the spanned slots would take hundreds of megabytes.
+    assert peak < 20_000_000
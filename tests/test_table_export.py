@@ -0,0 +1,95 @@
+from csv import reader
+from io import BytesIO, StringIO
+from json import loads
+
+from pytest import importorskip, mark, raises, warns
+
+from wikitextparser import TableRecord, export_tables, iter_table_records
+
+DOCUMENTS = [
+    (1, '{|\n|+cap\n|- style="a"\n| a || b\n|-\n| colspan=2 | c\n|}'),
+    (2, 'no tables'),
+    ('x', '{|\n| d\n{|\n| e\n|}\n|}'),
+]
+RECORDS = [
+    TableRecord(1, 0, 'cap', [{'style': 'a'}, {}], [['a', 'b'], ['c', 'c']]),
+    TableRecord('x', 0, None, [], [['d\n{|\n| e\n|}']]),
+    TableRecord('x', 1, None, [], [['e']]),
+]
+
+
+@mark.parametrize('processes', [1, 2])
+def test_iter_table_records(processes):
+    assert [*iter_table_records(DOCUMENTS, processes)] == RECORDS
+
+
+@mark.parametrize('processes', [1, 2])
+def test_iter_table_records_skips_documents_that_fail(processes):
+    documents = [DOCUMENTS[0], (5, None), DOCUMENTS[2]]
+    with warns(RuntimeWarning, match='5'):
+        records = [*iter_table_records(documents, processes)]
+    assert records == RECORDS
+
+
+def test_export_tables_csv():
+    f = StringIO(newline='')
+    assert export_tables(DOCUMENTS, f, processes=1) == 3
+    header, *rows = reader(StringIO(f.getvalue()))
+    assert header == [*TableRecord._fields]
+    assert [
+        [page_id, int(index), caption, loads(row_attrs), loads(data)]
+        for page_id, index, caption, row_attrs, data in rows
+    ] == [[str(r[0]), r[1], r[2] or '', r[3], r[4]] for r in RECORDS]
+
+
+def test_export_tables_csv_path(tmp_path):
+    path = tmp_path / 'tables.csv'
+    assert export_tables(DOCUMENTS, path, 'csv', processes=1) == 3
+    with open(path, encoding='utf8', newline='') as f:
+        assert len([*reader(f)]) == 4
+
+
+def test_export_tables_arrow():
+    pa = importorskip('pyarrow')
+    f = BytesIO()
+    count = export_tables(DOCUMENTS, f, 'arrow', processes=1, batch_size=1)
+    assert count == 3
+    f.seek(0)
+    table = pa.ipc.open_file(f).read_all()
+    assert table.column_names == [*TableRecord._fields]
+    # page_ids of different types are written as strings.
+    assert table.to_pylist() == [
+        {
+            'page_id': str(r.page_id),
+            'table_index': r.table_index,
+            'caption': r.caption,
+            'row_attrs': [[*attrs.items()] for attrs in r.row_attrs],
+            'data': r.data,
+        }
+        for r in RECORDS
+    ]
+
+
+def test_export_tables_arrow_without_tables():
+    pa = importorskip('pyarrow')
+    f = BytesIO()
+    assert export_tables([(1, 'x')], f, 'arrow', processes=1) == 0
+    f.seek(0)
+    assert pa.ipc.open_file(f).read_all().num_rows == 0
+
+
+def test_export_tables_unknown_file_format():
+    with raises(ValueError):
+        export_tables(DOCUMENTS, StringIO(), 'json')
+
+
+@mark.parametrize('processes, max_pending', [(0, None), (-1, 2), (2, 0)])
+def test_iter_table_records_rejects_invalid_limits(processes, max_pending):
+    with raises(ValueError):
+        iter_table_records(DOCUMENTS, processes, max_pending)
+    with raises(ValueError):
+        export_tables(DOCUMENTS, StringIO(), 'csv', processes, max_pending)
+
+
+def test_iter_table_records_with_one_pending_document():
+    assert [*iter_table_records(DOCUMENTS, 2, 1)] == RECORDS
@@ -0,0 +1,247 @@
+from pytest import mark
+
+from wikitextparser import Template, parse
+
+WS = '\r\n\t '
+
+AS_DICT_STRINGS = [
+    '{{t}}',
+    '{{t|}}',
+    '{{t| a = 1 | b |a=2}}',
+    '{{t|a|b=1|c| d |2=e|f}}',
+    '{{t|x={{u|y=1}}|[[a|b]]|{{{p|q=r}}}}}',
+    '{{t|a<!-- = -->|b=<!-- c -->1}}',
+    '{{t|\n== h ==\n|b=1}}',
+    '{{t|a=\n== h ==\n|b=1}}',
+    '{{#if:a|b=c|d}}',
+]
+
+
+def arguments_as_dict(template, strip, last_wins):
+    result = {}
+    for arg in template.arguments:
+        name, value = arg.name, arg.value
+        if strip:
+            name = name.strip(WS)
+            if not arg.positional:
+                value = value.strip(WS)
+        if last_wins or name not in result:
+            result[name] = value
+    return result
+
+
+@mark.parametrize('string', AS_DICT_STRINGS)
+@mark.parametrize('strip', [True, False])
+@mark.parametrize('last_wins', [True, False])
+def test_as_dict_matches_the_arguments(string, strip, last_wins):
+    template = Template(string)
+    expected = arguments_as_dict(template, strip, last_wins)
+    got = template.as_dict(strip, last_wins)
+    assert got == expected
+    assert [*got] == [*expected]
+
+
+def test_as_dict():
+    template = Template('{{t| a = 1 | b |a=2}}')
+    assert template.as_dict() == {'a': '2', '1': ' b '}
+    assert template.as_dict(False, False) == {
+        ' a ': ' 1 ',
+        '1': ' b ',
+        'a': '2',
+    }
+
+
+def test_templates_as_records():
+    wikitext = parse('{{a|1}}{{b|x=2|{{a| y = 3 }}}}')
+    assert wikitext.templates_as_records() == [
+        ('a', {'1': '1'}),
+        ('b', {'x': '2', '1': '{{a| y = 3 }}'}),
+        ('a', {'y': '3'}),
+    ]
+    assert wikitext.templates_as_records(['b'], strip=False) == [
+        ('b', {'x': '2', '1': '{{a| y = 3 }}'})
+    ]
+    assert wikitext.templates_as_records(['c']) == []
+
+
+SET_ARGS_STRINGS = [
+    '{{t}}',
+    '{{t|a=1|b=2}}',
+    '{{t|a|b}}',
+    '{{t\n| a = 1\n| bb = 2\n}}',
+    '{{t|b=1|b=2|c={{u|b=3}}}}',
+]
+MAPPINGS = [
+    {'b': '3', 'c': '4'},
+    {'1': 'x', 'new one': 'y'},
+    {' a ': ' v ', 'zz': ''},
+    {'b': '{{q|1}}', '2': '[[l]]'},
+]
+
+
+@mark.parametrize('string', SET_ARGS_STRINGS)
+@mark.parametrize('mapping', MAPPINGS)
+def test_set_args_matches_set_arg(string, mapping):
+    one_by_one = parse(string)
+    template = one_by_one.templates[0]
+    for name, value in mapping.items():
+        template.set_arg(name, value)
+    at_once = parse(string)
+    at_once.templates[0].set_args(mapping)
+    assert at_once.string == one_by_one.string
+    assert [t.string for t in at_once.templates] == [
+        t.string for t in parse(at_once.string).templates
+    ]
+
+
+def test_set_args_updates_existing_nodes():
+    wikitext = parse('{{t|a=1|b={{u}}}}x')
+    template, inner = wikitext.templates
+    template.set_args({'a': '2', 'c': '3'})
+    assert wikitext.string == '{{t|a=2|b={{u}}|c=3}}x'
+    assert template.string == '{{t|a=2|b={{u}}|c=3}}'
+    assert inner.string == '{{u}}'
+    assert template.get_arg('c').value == '3'
+
+
+def test_set_args_order():
+    template = Template('{{t|a=1}}')
+    template.set_args({'c': '3', 'b': '2', 'a': '0'}, order=['b'])
+    assert template.string == '{{t|a=0|b=2|c=3}}'
+
+
+def test_set_args_preserve_spacing():
+    template = Template('{{t\n| a = 1\n| bb = 2\n}}')
+    template.set_args({'a': 'x', 'c': 'y'}, preserve_spacing=True)
+    # The same as calling set_arg for each item.
+    assert template.string == '{{t\n| a = x\n| bb = 2\n| c = y\n}}'
+
+
+def test_templates_named_normalizes_names():
+    wikitext = parse(
+        '{{Foo_bar}}{{foo bar}}{{Template:foo  bar}}'
+        '{{ template : Foo_bar |x}}{{Vorlage:foo bar}}{{baz}}'
+    )
+
+    def named(names, **kwargs):
+        return [t.string for t in wikitext.templates_named(names, **kwargs)]
+
+    def expected(names, **kwargs):
+        return [
+            t.string
+            for t in wikitext.templates
+            if t.normal_name(**kwargs) in names
+        ]
+
+    assert named('Foo bar') == ['{{Foo_bar}}', '{{ template : Foo_bar |x}}']
+    assert named({'foo bar'}) == ['{{foo bar}}', '{{Template:foo  bar}}']
+    assert named('Foo bar', capitalize=True) == [
+        '{{Foo_bar}}',
+        '{{foo bar}}',
+        '{{Template:foo  bar}}',
+        '{{ template : Foo_bar |x}}',
+    ]
+    namespaces = ('Template', 'Vorlage')
+    assert named(['foo bar', 'baz'], rm_namespaces=namespaces) == [
+        '{{foo bar}}',
+        '{{Template:foo  bar}}',
+        '{{Vorlage:foo bar}}',
+        '{{baz}}',
+    ]
+    for kwargs in ({}, {'capitalize': True}, {'rm_namespaces': ()}):
+        for names in ({'Foo bar'}, {'foo bar', 'Template:foo bar'}):
+            assert named(names, **kwargs) == expected(names, **kwargs)
+
+
+def test_templates_named_after_renaming():
+    wikitext = parse('{{a|{{b}}}}{{a}}')
+    assert [t.string for t in wikitext.templates_named('a')] == [
+        '{{a|{{b}}}}',
+        '{{a}}',
+    ]
+    wikitext.templates[0].name = 'b'
+    assert [t.string for t in wikitext.templates_named('a')] == ['{{a}}']
+    assert [t.string for t in wikitext.templates_named('b')] == [
+        '{{b|{{b}}}}',
+        '{{b}}',
+    ]
+    wikitext.insert(0, '{{a}}')
+    assert [t.span for t in wikitext.templates_named('a')] == [
+        (0, 5),
+        (16, 21),
+    ]
+    # Only the templates inside a sub-node are returned from it.
+    outer = wikitext.templates[1]
+    assert [t.string for t in outer.templates_named('b')] == ['{{b}}']
+
+
+def test_nesting_level_of_templates_and_parser_functions():
+    wikitext = parse(
+        '{{a|{{#if:{{b|{{c}}}}|{{#expr:{{d}}}}}}}} {{e}}'
+        ' [[l|{{f|{{g}}}}]] <ref>{{h}}</ref>'
+    )
+
+    def levels():
+        return [
+            (t.string, t.nesting_level)
+            for t in sorted(
+                wikitext.templates + wikitext.parser_functions,
+                key=lambda t: t.span,
+            )
+        ]
+
+    assert levels() == [
+        ('{{a|{{#if:{{b|{{c}}}}|{{#expr:{{d}}}}}}}}', 1),
+        ('{{#if:{{b|{{c}}}}|{{#expr:{{d}}}}}}', 2),
+        ('{{b|{{c}}}}', 3),
+        ('{{c}}', 4),
+        ('{{#expr:{{d}}}}', 3),
+        ('{{d}}', 4),
+        ('{{e}}', 1),
+        ('{{f|{{g}}}}', 1),
+        ('{{g}}', 2),
+        ('{{h}}', 1),
+    ]
+    c = wikitext.templates[2]
+    wikitext.insert(0, '{{s}}')
+    wikitext.templates[4].string = '{{q|{{r}}}}'
+    assert (c.string, c.nesting_level) == ('{{c}}', 4)
+    assert levels()[:8] == [
+        ('{{s}}', 1),
+        ('{{a|{{#if:{{b|{{c}}}}|{{#expr:{{q|{{r}}}}}}}}}}', 1),
+        ('{{#if:{{b|{{c}}}}|{{#expr:{{q|{{r}}}}}}}}', 2),
+        ('{{b|{{c}}}}', 3),
+        ('{{c}}', 4),
+        ('{{#expr:{{q|{{r}}}}}}', 3),
+        ('{{q|{{r}}}}', 4),
+        ('{{r}}', 5),
+    ]
+
+
+def test_set_args_with_a_positional_value_that_contains_equal_sign():
+    mapping = {'1': 'a=b', '2': 'c', 'd': 'e'}
+    one_by_one = Template('{{t|x|y|z}}')
+    for name, value in mapping.items():
+        one_by_one.set_arg(name, value)
+    template = Template('{{t|x|y|z}}')
+    template.set_args(mapping)
+    # y is the first positional argument after the first edit.
+    assert template.string == one_by_one.string == '{{t|a=b|y|c|d=e}}'
+    # An '=' that does not make the argument a keyword one.
+    template = Template('{{t|x|y}}')
+    template.set_args({'1': '{{u|a=b}}', '2': 'c'})
+    assert template.string == '{{t|{{u|a=b}}|c}}'
+
+
+def test_set_args_with_a_new_positional_argument():
+    mapping = {'': 'V', '2': 'x', 'a': 'b'}
+    one_by_one = Template('{{u|w}}')
+    for name, value in mapping.items():
+        one_by_one.set_arg(name, value)
+    template = Template('{{u|w}}')
+    template.set_args(mapping)
+    # '2' is the new positional argument when it is set.
+    assert template.string == one_by_one.string == '{{u|w|x|a=b}}'
+    template = Template('{{u|w}}')
+    template.set_args({'a': 'b', '': 'V'})
+    assert template.string == '{{u|w|a=b|V}}'
@@ -0,0 +1,346 @@
+from pytest import mark, raises
+
+from wikitextparser import iter_remove_markup, parse, remove_markup
+
+
+def test_memoize_reuses_results_until_mutation():
+    wt = parse('{{a}}{{b}}')
+    wt.memoize()
+    templates = wt.templates
+    assert wt._lststr.memo
+    # A copy of the memoized list is returned.
+    templates.pop()
+    assert [t.name for t in wt.templates] == ['a', 'b']
+    wt.templates[0].name = 'c'
+    assert [t.name for t in wt.templates] == ['c', 'b']
+
+
+def test_memoize_invalidated_by_sub_node_edits():
+    wt = parse('{{a|{{b}}}} [[l]]')
+    wt.memoize()
+    template = wt.templates[0]
+    assert [t.name for t in template.templates] == ['b']
+    assert [w.title for w in wt.wikilinks] == ['l']
+    template.arguments[0].value = '{{c}}{{d}}'
+    assert [t.name for t in template.templates] == ['c', 'd']
+    assert [t.name for t in wt.templates] == ['a', 'c', 'd']
+    wt.wikilinks[0].title = 'm'
+    assert [w.title for w in wt.wikilinks] == ['m']
+    assert wt.string == '{{a|{{c}}{{d}}}} [[m]]'
+
+
+def test_memoize_maxsize_and_disable():
+    wt = parse("{{a}} [[b]] ''c''")
+    wt.memoize(1)
+    wt.templates
+    wt.wikilinks
+    assert len(wt._lststr.memo) == 1
+    wt.memoize(None)
+    assert wt._lststr.memo is None
+    assert [t.name for t in wt.templates] == ['a']
+
+
+def test_invalidate():
+    wt = parse('{{a}}')
+    wt.memoize()
+    wt.templates
+    wt.invalidate()
+    assert not wt._lststr.memo
+    assert [t.name for t in wt.templates] == ['a']
+
+
+def test_accessors_return_the_same_node_for_the_same_span():
+    wt = parse('{{a|{{b}}|x=[[c]]}}<!--d--><ref>{{{p}}}</ref>')
+    template = wt.templates[0]
+    assert template is wt.templates[0]
+    assert template is next(wt.iter_templates())
+    assert wt.templates[1] is template.templates[0]
+    assert wt.wikilinks[0] is template.wikilinks[0]
+    assert wt.comments[0] is wt.comments[0]
+    assert wt.parameters[0] is wt.get_tags()[0].parameters[0]
+    assert template.arguments[1] is template.arguments[1]
+    assert wt.wikilinks[0].parent() is template
+    assert wt.templates[1].ancestors() == [template]
+
+
+def test_node_identity_survives_unrelated_edits():
+    wt = parse('{{a}} {{b}}')
+    a, b = wt.templates
+    wt.insert(0, 'x')
+    assert wt.templates == [a, b]
+    assert wt.templates[1] is b
+    b.name = 'c'
+    assert wt.templates[1] is b
+    assert wt.string == 'x{{a}} {{c}}'
+
+
+def test_parent_children_and_ancestors():
+    wt = parse('{{a|[[b|{{{c}}}]]}}<!--d--><ref>{{#if:e}}</ref>')
+    template = wt.templates[0]
+    wikilink = wt.wikilinks[0]
+    parameter = wt.parameters[0]
+    tag = wt.get_tags()[0]
+    assert [type(c).__name__ for c in wt.children()] == [
+        'Template',
+        'Comment',
+        'Tag',
+    ]
+    assert wt.children('Comment') == wt.comments
+    assert template.children() == [wikilink]
+    assert tag.children() == wt.parser_functions
+    assert parameter.parent() is wikilink
+    assert parameter.parent('Template') is template
+    assert parameter.ancestors() == [wikilink, template]
+    assert parameter.ancestors('WikiLink') == [wikilink]
+    assert wt.parser_functions[0].parent() is tag
+    assert template.parent() is None
+
+
+def test_plain_text_of_tags_and_parameters_containing_tables():
+    # Like a re-parse of the node, the cells of the table are kept.
+    tag = parse('<ref>\n{|\n|a\n|}\n</ref>').get_tags()[0]
+    assert tag.plain_text() == parse(tag.string).plain_text() == '\n\na\n\n'
+    tag = parse('<ref>{{{p|\n{|\n|a\n|}\n}}}</ref>').get_tags()[0]
+    assert tag.plain_text() == '\n\na\n\n'
+    parameter = parse('{{{p|<ref>\n{|\n|a\n|}\n</ref>}}}').parameters[0]
+    assert parameter.plain_text() == '\n\na\n\n'
+    assert parameter.get_tags()[0].plain_text() == '\n\na\n\n'
+
+
+def test_subtree_view_is_relative_and_isolated():
+    wt = parse('x {{a|{{b|c}}|[[d]]<!--e-->}} y')
+    template = wt.templates[0]
+    view = template._subtree_view()
+    assert view.string == template.string == '{{a|{{b|c}}|[[d]]<!--e-->}}'
+    assert [t.span for t in view.templates] == [(0, 27), (4, 11)]
+    assert view.wikilinks[0].span == (12, 17)
+    # Edits through the view or its nodes do not reach the document.
+    view.templates[1].name = 'bbb'
+    view.wikilinks[0].target = 'ee'
+    del view[:1]
+    assert view.string == '{a|{{bbb|c}}|[[ee]]<!--e-->}}'
+    # The spans that were not used before the edits are updated, too.
+    assert view.comments[0].string == '<!--e-->'
+    assert wt.string == 'x {{a|{{b|c}}|[[d]]<!--e-->}} y'
+    assert [t.string for t in wt.templates] == [
+        '{{a|{{b|c}}|[[d]]<!--e-->}}',
+        '{{b|c}}',
+    ]
+    assert wt.wikilinks[0].string == '[[d]]'
+    assert wt.comments[0].span == (19, 27)
+    assert template.plain_text() == ''
+
+
+def test_plain_text_offset_map_round_trips():
+    string = "a ''b'' {{t|x}} [[L|lab]] &amp; c<!--z--> [http://x.y ext]"
+    text, offsets = parse(string).plain_text(with_offsets=True)
+    assert text == parse(string).plain_text() == 'a b  lab & c ext'
+    assert offsets.length == len(text)
+    for i, char in enumerate(text):
+        source = offsets.to_source(i)
+        assert offsets.to_plain(source) == i
+        b, e = offsets.source_span(i, i + 1)
+        assert b == source
+        if char == '&':
+            assert string[b:e] == '&amp;'
+        else:
+            assert string[b:e] == char
+    assert offsets.to_source(len(text)) == len(string) - 1
+    # Removed source characters map to where they would have been.
+    assert offsets.to_plain(string.index('{{')) == 4
+    assert offsets.to_plain(string.index('<!--')) == 12
+    b, e = offsets.source_span(5, 8)
+    assert string[b:e] == 'lab'
+
+
+def test_plain_text_offset_map_of_sub_nodes():
+    wt = parse('x {{t|1=[[a|b]] &lt;}}')
+    argument = wt.templates[0].arguments[0]
+    text, offsets = argument.plain_text(with_offsets=True)
+    assert text == argument.plain_text() == '|1=b <'
+    string = argument.string
+    for i, char in enumerate(text):
+        b, e = offsets.source_span(i, i + 1)
+        assert offsets.to_plain(b) == i
+        assert string[b:e] == ('&lt;' if char == '<' else char)
+    text, offsets = argument.plain_text(
+        with_offsets=True, unescape_html_entities=False
+    )
+    assert text == '|1=b &lt;'
+    assert offsets.source_span(5, 9) == (11, 15)
+
+
+def test_offset_map_out_of_range():
+    text, offsets = parse('a').plain_text(with_offsets=True)
+    assert offsets.to_source(1) == 1
+    with raises(IndexError):
+        offsets.to_source(2)
+    with raises(IndexError):
+        offsets.source_span(0, 2)
+
+
+ITER_PLAIN_TEXT_STRING = (
+    "a &amp; ''b'' {{t|x}}\n== s ==\n[[l|lab]] &#x3B1;&nbsp;c\n"
+    '{|\n|1||2\n|}\n=== t ===\n&lt;ref&gt; <ref>r</ref>'
+)
+
+
+@mark.parametrize('chunk_size', [None, 1, 2, 3, 5, 8, 65536])
+@mark.parametrize('unescape_html_entities', [True, False])
+def test_iter_plain_text_chunks_join_to_plain_text(
+    chunk_size, unescape_html_entities
+):
+    wt = parse(ITER_PLAIN_TEXT_STRING)
+    chunks = [
+        *wt.iter_plain_text(
+            chunk_size=chunk_size,
+            unescape_html_entities=unescape_html_entities,
+        )
+    ]
+    assert all(chunks)
+    assert ''.join(chunks) == wt.plain_text(
+        unescape_html_entities=unescape_html_entities
+    )
+
+
+def test_iter_plain_text_of_sub_nodes_and_iter_remove_markup():
+    wt = parse(ITER_PLAIN_TEXT_STRING)
+    for node in wt.sections + wt.templates + wt.get_tags():
+        assert ''.join(node.iter_plain_text(chunk_size=2)) == (
+            node.plain_text()
+        )
+    chunks = iter_remove_markup(ITER_PLAIN_TEXT_STRING, chunk_size=4)
+    assert ''.join(chunks) == remove_markup(ITER_PLAIN_TEXT_STRING)
+    # With chunk_size=None, each section is a separate chunk.
+    assert [*iter_remove_markup('a\n== b ==\nc', chunk_size=None)] == [
+        'a\n',
+        '== b ==\nc',
+    ]
+
+
+def test_plain_texts_equal_plain_text_of_each_node():
+    wt = parse(
+        'a {{t|x=[[l|lab]] {{u|<ref>r {{v}}</ref>}}}} b &amp;\n'
+        '{|\n'
+        "| c1 || [[m]] ''i''\n"
+        '|-\n'
+        '| <span>s</span> || {{w|1}}\n'
+        '|}\n'
+    )
+    table = wt.tables[0]
+    nodes = (
+        wt.templates
+        + wt.templates[0].arguments
+        + wt.wikilinks
+        + wt.get_tags()
+        + wt.tables
+        + table.cells(row=0)
+    )
+    assert wt.plain_texts(nodes) == [n.plain_text() for n in nodes]
+    # Unsorted and duplicate nodes keep their order and count.
+    nodes = nodes[::-1] + nodes[:3]
+    assert wt.plain_texts(nodes) == [n.plain_text() for n in nodes]
+    assert wt.plain_texts(
+        nodes, replace_templates=False, unescape_html_entities=False
+    ) == [
+        n.plain_text(replace_templates=False, unescape_html_entities=False)
+        for n in nodes
+    ]
+    assert wt.plain_texts([]) == []
+    # Nodes of nodes work, too.
+    cells = table.cells(row=1)
+    assert table.plain_texts(cells) == [c.plain_text() for c in cells]
+    assert table.plain_texts(cells) == ['\n| s ', '|| ']
+
+
+def test_plain_texts_only_apply_markup_inside_each_node():
+    wt = parse("a '''b ''c''' d''")
+    bold, italic = wt.get_bolds_and_italics()
+    assert bold.string == "'''b ''c'''"
+    # Parsed on its own, the bold contains an italic that ends inside it.
+    assert bold.plain_text() == 'b c'
+    # In the document, that italic crosses the end of the bold.
+    assert wt.plain_texts([bold, italic]) == ["b ''c", "c''' d"]
+    assert italic.plain_text() == "c''' d"
+
+
+ITER_ACCESSORS = [
+    ('iter_templates', 'templates'),
+    ('iter_parameters', 'parameters'),
+    ('iter_parser_functions', 'parser_functions'),
+    ('iter_wikilinks', 'wikilinks'),
+    ('iter_comments', 'comments'),
+    ('iter_extension_tags', '_extension_tags'),
+]
+
+
+@mark.parametrize('iter_name, name', ITER_ACCESSORS)
+def test_iter_accessors_yield_the_nodes_of_list_accessors(iter_name, name):
+    wt = parse(
+        '{{a|{{b|[[c|{{{d|{{{e}}}}}}]]}}<!--f-->}} '
+        '{{#if:{{#if:x|y}}|[[g|[[h]]]]}} '
+        '<ref>{{i}}<ref>j<!--k--></ref>[[l]]</ref><!--m-->'
+    )
+    nodes = (
+        [wt]
+        + wt.templates
+        + wt.parameters
+        + wt.parser_functions
+        + wt.wikilinks
+        + wt.comments
+        + wt.get_tags()
+        + wt.templates[0].arguments
+    )
+    for node in nodes:
+        expected = getattr(node, name)
+        got = [*getattr(node, iter_name)()]
+        assert [n.span for n in got] == [n.span for n in expected]
+        assert all(a is b for a, b in zip(got, expected))
+    # The subclass overrides do not yield the node itself.
+    assert [t.string for t in wt.templates[0].iter_templates()] == [
+        '{{b|[[c|{{{d|{{{e}}}}}}]]}}'
+    ]
+    assert [*wt.comments[0].iter_comments()] == []
+
+
+def test_top_level_templates_and_wikilinks():
+    wt = parse(
+        '{{a|{{b|{{c}}}}|[[L|{{d|{{e}}}}]]}} [[F|[[G|x]] {{h|[[I]]}}]]'
+        ' <ref>{{j|{{k}}}}</ref> [[M]]'
+    )
+    # Nodes inside other types of nodes are still top-level.
+    assert [t.string for t in wt.get_templates(top_level_only=True)] == [
+        '{{a|{{b|{{c}}}}|[[L|{{d|{{e}}}}]]}}',
+        '{{h|[[I]]}}',
+        '{{j|{{k}}}}',
+    ]
+    assert [w.string for w in wt.get_wikilinks(top_level_only=True)] == [
+        '[[L|{{d|{{e}}}}]]',
+        '[[F|[[G|x]] {{h|[[I]]}}]]',
+        '[[M]]',
+    ]
+    assert wt.get_templates() == wt.templates
+    assert wt.get_wikilinks() == wt.wikilinks
+    a = wt.templates[0]
+    assert [t.string for t in a.get_templates(top_level_only=True)] == [
+        '{{b|{{c}}}}',
+        '{{d|{{e}}}}',
+    ]
+    assert [w.string for w in a.get_wikilinks(top_level_only=True)] == [
+        '[[L|{{d|{{e}}}}]]'
+    ]
+    f = wt.wikilinks[1]
+    assert [w.string for w in f.get_wikilinks(top_level_only=True)] == [
+        '[[G|x]]',
+        '[[I]]',
+    ]
+    argument = a.arguments[1]
+    assert [t.string for t in argument.get_templates(top_level_only=True)] == [
+        '{{d|{{e}}}}'
+    ]
+    # The results follow edits.
+    a.arguments[0].value = '{{n}}'
+    assert [t.string for t in a.get_templates(top_level_only=True)] == [
+        '{{n}}',
+        '{{d|{{e}}}}',
+    ]